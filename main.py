@@ -4,6 +4,28 @@ import pygame
 import websockets
 import time
 import random 
+import collections
+import functools
+import concurrent.futures
+import heapq
+
+try:
+    import numpy as np # Used by pygame.surfarray for fast sprite recoloring
+except ImportError:
+    np = None
+
+try:
+    import orjson # Optional C JSON codec; much faster on the big state updates
+    json_loads = orjson.loads
+    def json_dumps(obj):
+        return orjson.dumps(obj).decode() # Keep sending text frames
+except ImportError:
+    json_loads = json.loads
+    json_dumps = json.dumps
+
+# The move packet is sent constantly and always has the same shape, so it skips the encoder entirely
+MOVE_MESSAGE = '{{"type":"move","dx":{},"dy":{}}}'
+RESYNC_MESSAGE = '{"type":"resync"}' # Asks the server for a full update after the inbox dropped messages
 
 # --- MODIFIED: Constants ---
 WIDTH, HEIGHT = 800, 600
@@ -11,7 +33,9 @@ SIDE_PANEL_WIDTH = 200
 PANEL_COLOR = (30, 30, 30) 
 
 FRAME_RATE = 60
-WEBSOCKET_SEND_TIMEOUT = 0.1
+FRAME_INTERVAL = 1 / FRAME_RATE
+LEADERBOARD_ROWS = HEIGHT // 50 # Panel leaderboard rows are 50px apart; anything past this is off-screen
+MOVE_SEND_INTERVAL = 0.03 # Held-key movement is summed and sent at most this often (seconds)
 PLAYER_SPEED = 7
 PLAYER_SIZE = 64
 RESOURCE_SIZE = 32
@@ -33,10 +57,29 @@ LOBBY_SPRITE_CACHE = {}
 GAME_SPRITE_CACHE_L = {} # Will hold [idle]
 GAME_SPRITE_CACHE_R = {} # Will hold [idle]
 
+# --- Recolored sprites keyed by color (the player caches above just point into these) ---
+COLOR_CACHE_MAX = 64
+COLOR_CACHE_LOBBY = collections.OrderedDict()
+COLOR_CACHE_GAME = collections.OrderedDict() # color -> (left sprite, right sprite)
+
+# --- Small avatars (chat + panel lists), pre-scaled (and pre-flipped for own chat messages) per player ---
+CHAT_AVATAR_SIZE = (35, 45)
+AVATAR_SCALED = {}
+AVATAR_SCALED_FLIPPED = {}
+
+# --- Round-over screen sprites (1.5x idle frame), scaled once per player ---
+ROUND_OVER_SPRITE_SIZE = (PLAYER_SIZE * 1.5, int(PLAYER_SIZE * 1.1 * 1.5))
+ROUND_OVER_SPRITES = {}
+
 IDLE_TEMPLATE_L = None
 IDLE_TEMPLATE_R = None
 IDLE_TEMPLATE_SHADOWLESS = None
 
+# Per-template recolor label maps (see classify_template)
+LABEL_NONE, LABEL_VISOR, LABEL_BODY, LABEL_SHADOW = 0, 1, 2, 3
+LABELS_L = None
+LABELS_SHADOWLESS = None
+
 LOBBY_VISUALS = {}
 
 # --- NEW: Chat UI Assets ---
@@ -53,88 +96,104 @@ def get_chat_timestamp():
     """Returns a formatted string for the chat timestamp, e.g., '14:32'"""
     return time.strftime("%H:%M", time.localtime())
 
+def to_monotonic(wall_time):
+    """Maps a server wall-clock timestamp onto the local time.monotonic() clock (immune to clock jumps)."""
+    return time.monotonic() + (wall_time - time.time())
+
 # --- MODIFIED: Pygame setup ---
 pygame.init()
 pygame.mixer.init()
 pygame.font.init() # --- NEW: Ensure font module is initialized ---
 
+# Only queue the event types the loops actually handle; everything else is dropped at the source.
+# TEXTINPUT stays allowed because pygame 2 fills KEYDOWN.unicode from it (chat typing).
+pygame.event.set_blocked(None)
+pygame.event.set_allowed([pygame.QUIT, pygame.KEYDOWN, pygame.TEXTINPUT,
+                          pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION])
+
+# --- Shared font instances: one Font object per (path, size, style) ---
+@functools.lru_cache(maxsize=32)
+def get_font(path, size, bold=False, italic=False, system=False):
+    """`path` is a font file (None = pygame default), or a system font name when `system` is True."""
+    if system:
+        return pygame.font.SysFont(path, size, bold=bold, italic=italic)
+    loaded_font = pygame.font.Font(path, size)
+    loaded_font.set_bold(bold)
+    loaded_font.set_italic(italic)
+    return loaded_font
+
 # Font setup
 try:
     FONT_NAME = 'Arial'
-    font = pygame.font.SysFont(FONT_NAME, TEXT_SIZE)
-    duration_font = pygame.font.SysFont(FONT_NAME, 28, bold=True)
-    button_font = pygame.font.SysFont(FONT_NAME, 60, bold=True)
-    panel_title_font = pygame.font.SysFont(FONT_NAME, 36, bold=True)
-    panel_text_font = pygame.font.SysFont(FONT_NAME, 28)
-    title_font = pygame.font.SysFont(FONT_NAME, 72, bold=True)
+    font = get_font(FONT_NAME, TEXT_SIZE, system=True)
+    duration_font = get_font(FONT_NAME, 28, bold=True, system=True)
+    button_font = get_font(FONT_NAME, 60, bold=True, system=True)
+    panel_title_font = get_font(FONT_NAME, 36, bold=True, system=True)
+    panel_text_font = get_font(FONT_NAME, 28, system=True)
+    title_font = get_font(FONT_NAME, 72, bold=True, system=True)
 
     # --- NEW: Load Custom Pixel Font ---
-    pixel_title_font = pygame.font.Font('Jacquard24-Regular.ttf', 96) # Size 96
+    pixel_title_font = get_font('Jacquard24-Regular.ttf', 96) # Size 96
     # --- NEW: Smaller pixel font for timer screen ---
-    pixel_title_font_small = pygame.font.Font('Jacquard24-Regular.ttf', 72) 
+    pixel_title_font_small = get_font('Jacquard24-Regular.ttf', 72) 
 
-    lobby_name_font = pygame.font.SysFont(FONT_NAME, 18)
+    lobby_name_font = get_font(FONT_NAME, 18, system=True)
 
     # --- NEW: Fonts for the New Panel ---
-    panel_tab_font = pygame.font.SysFont(FONT_NAME, 24, bold=True)
-    panel_list_font = pygame.font.SysFont(FONT_NAME, 22)
-    panel_leaderboard_font = pygame.font.SysFont(FONT_NAME, 18) # <-- NEW
+    panel_tab_font = get_font(FONT_NAME, 24, bold=True, system=True)
+    panel_list_font = get_font(FONT_NAME, 22, system=True)
+    panel_leaderboard_font = get_font(FONT_NAME, 18, system=True) # Same instance as lobby_name_font
     # --- END NEW ---
 
     # --- MODIFIED: Chat UI Fonts (Using default font) ---
 
-    chat_bubble_font = pygame.font.Font(None, 18) # Use default font
-    chat_timestamp_font = pygame.font.Font(None, 12) # Use default font
-    chat_name_font = pygame.font.Font(None, 16) # Use default font
-    chat_name_font.set_bold(True)
-    chat_system_font = pygame.font.Font(None, 16) # Use default font
-    chat_system_font.set_italic(True)
-    chat_input_font = pygame.font.Font(None, 18) # Use default font
+    chat_bubble_font = get_font(None, 18) # Use default font
+    chat_timestamp_font = get_font(None, 12) # Use default font
+    chat_name_font = get_font(None, 16, bold=True) # Use default font
+    chat_system_font = get_font(None, 16, italic=True) # Use default font
+    chat_input_font = get_font(None, 18) # Same instance as chat_bubble_font
     
     # --- NEW: Timer Screen Font ---
-    timer_number_font = pygame.font.Font('Jacquard24-Regular.ttf', 80)
+    timer_number_font = get_font('Jacquard24-Regular.ttf', 80)
     
     # --- NEW: In-Game Score Font ---
-    score_box_font = pygame.font.SysFont(FONT_NAME, 18, bold=True)
+    score_box_font = get_font(FONT_NAME, 18, bold=True, system=True)
 
 
 except Exception as e:
     print(f"Warning: Could not load 'Jacquard24-Regular.ttf' or '{FONT_NAME}' font. Falling back to default. Error: {e}")
     # Fallback fonts
-    font = pygame.font.Font(None, TEXT_SIZE)
-    duration_font = pygame.font.Font(None, 28)
-    button_font = pygame.font.Font(None, 60)
-    panel_title_font = pygame.font.Font(None, 36)
-    panel_text_font = pygame.font.Font(None, 28)
-    title_font = pygame.font.Font(None, 72)
+    font = get_font(None, TEXT_SIZE)
+    duration_font = get_font(None, 28)
+    button_font = get_font(None, 60)
+    panel_title_font = get_font(None, 36)
+    panel_text_font = get_font(None, 28)
+    title_font = get_font(None, 72)
     
     # --- NEW: Fallback for Custom Font ---
     pixel_title_font = title_font # Use the default title font as a fallback
     pixel_title_font_small = title_font
 
-    lobby_name_font = pygame.font.Font(None, 18)
+    lobby_name_font = get_font(None, 18)
 
     # --- NEW: Fallbacks for New Panel Fonts ---
-    panel_tab_font = pygame.font.Font(None, 24)
-    panel_list_font = pygame.font.Font(None, 22)
-    panel_leaderboard_font = pygame.font.Font(None, 18) # <-- NEW
+    panel_tab_font = get_font(None, 24)
+    panel_list_font = get_font(None, 22)
+    panel_leaderboard_font = get_font(None, 18)
     # --- END NEW ---
     
     # --- MODIFIED: Chat Fonts Fallback ---
-    chat_bubble_font = pygame.font.Font(None, 18)
-    chat_timestamp_font = pygame.font.Font(None, 12)
-    chat_name_font = pygame.font.Font(None, 16)
-    chat_name_font.set_bold(True)
-    chat_system_font = pygame.font.Font(None, 16)
-    chat_system_font.set_italic(True)
-    chat_input_font = pygame.font.Font(None, 18)
+    chat_bubble_font = get_font(None, 18)
+    chat_timestamp_font = get_font(None, 12)
+    chat_name_font = get_font(None, 16, bold=True)
+    chat_system_font = get_font(None, 16, italic=True)
+    chat_input_font = get_font(None, 18)
     
     # --- NEW: Timer Font Fallback ---
     timer_number_font = button_font
     
     # --- NEW: Score Font Fallback ---
-    score_box_font = pygame.font.Font(None, 18)
-    score_box_font.set_bold(True)
+    score_box_font = get_font(None, 18, bold=True)
 
 
 # --- MODIFIED: Removed pygame.FULLSCREEN flag ---
@@ -144,12 +203,57 @@ clock = pygame.time.Clock()
 playground_rect = pygame.Rect(0, 0, WIDTH, HEIGHT)
 panel_rect = pygame.Rect(WIDTH, 0, SIDE_PANEL_WIDTH, HEIGHT)
 
+# Half-transparent black veil over the playground during the pre-game countdown (built once)
+COUNTDOWN_OVERLAY = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+COUNTDOWN_OVERLAY.fill((0, 0, 0, 128))
+
 # --- NEW: Chat State Variables ---
-chat_history = []
+chat_history = collections.deque(maxlen=CHAT_HISTORY_MAX) # Oldest messages fall off automatically
 is_chatting = False
 current_chat_message = ""
 active_panel_tab = "lobby" # --- NEW: Tracks active tab
 chat_scroll_offset = 0 # --- NEW: For scrolling
+chat_input_glyph_widths = [] # Pixel width of each typed character, so typing never re-measures the whole line
+chat_input_width = 0
+
+# --- Chat input editing (keeps the running pixel width in step with the text) ---
+def type_chat_char(char, max_width):
+    """Appends `char` to the chat input if the line stays under `max_width` pixels."""
+    global current_chat_message, chat_input_width
+    if not char: return
+    glyph_width = chat_input_font.size(char)[0]
+    if chat_input_width + glyph_width < max_width:
+        current_chat_message += char
+        chat_input_glyph_widths.append(glyph_width)
+        chat_input_width += glyph_width
+
+def erase_chat_char():
+    global current_chat_message, chat_input_width
+    if current_chat_message:
+        current_chat_message = current_chat_message[:-1]
+        chat_input_width -= chat_input_glyph_widths.pop()
+
+# The input line is only re-rendered when its text changes; the blinking cursor just picks a variant
+CHAT_INPUT_CACHE = {"key": None, "plain": None, "cursor": None}
+
+def get_chat_input_surface(input_color):
+    """Returns the rendered chat input line (placeholder, text, or text with a blinking cursor)."""
+    text, color = current_chat_message, input_color
+    if not is_chatting and not current_chat_message:
+        text, color = "Enter Here...", (100, 100, 100)
+    key = (text, color)
+    if CHAT_INPUT_CACHE["key"] != key:
+        CHAT_INPUT_CACHE["key"] = key
+        CHAT_INPUT_CACHE["plain"] = chat_input_font.render(text, True, color)
+        CHAT_INPUT_CACHE["cursor"] = chat_input_font.render(text + "|", True, color)
+    cursor_on = is_chatting and int(time.monotonic() * 2) % 2 == 0
+    return CHAT_INPUT_CACHE["cursor" if cursor_on else "plain"]
+
+def clear_chat_input():
+    global current_chat_message, chat_input_width
+    current_chat_message = ""
+    chat_input_glyph_widths.clear()
+    chat_input_width = 0
 
 # --- NEW: Chat UI Rects ---
 # We define the rectangles for the new chat UI
@@ -158,34 +262,54 @@ chat_input_rect = pygame.Rect(WIDTH + 10, HEIGHT - 230, SIDE_PANEL_WIDTH - 55, 4
 chat_send_rect = pygame.Rect(chat_input_rect.right + 5, HEIGHT - 230, 40, 40)
 
 
-# Load Coin Sprite (Unchanged)
-try:
-    coin_sprite = pygame.image.load("Coin.png")
-    coin_sprite = pygame.transform.scale(coin_sprite, (RESOURCE_SIZE, RESOURCE_SIZE))
-except Exception as e:
-    print(f"Warning: Could not load 'Coin.png': {e}")
-    coin_sprite = pygame.Surface((RESOURCE_SIZE, RESOURCE_SIZE), pygame.SRCALPHA)
-    pygame.draw.circle(coin_sprite, (255, 215, 0), (RESOURCE_SIZE//2, RESOURCE_SIZE//2), RESOURCE_SIZE//2)
+# --- Image loading helper: always convert to the display format, then scale ---
+def load_image(path, size=None, alpha=True):
+    image = pygame.image.load(path)
+    image = image.convert_alpha() if alpha else image.convert()
+    return pygame.transform.scale(image, size) if size else image
+
+
+# --- Lazy assets: only loaded (or faked) the first time something asks for them ---
+def lazy_asset(name, loader, fallback):
+    """Returns a getter that calls `loader` once, or `fallback` if loading fails."""
+    @functools.lru_cache(maxsize=None)
+    def get_asset():
+        try:
+            return loader()
+        except Exception as e:
+            print(f"Warning: Could not load '{name}': {e}")
+            return fallback()
+    return get_asset
+
+def make_fallback_coin():
+    coin = pygame.Surface((RESOURCE_SIZE, RESOURCE_SIZE), pygame.SRCALPHA).convert_alpha()
+    pygame.draw.circle(coin, (255, 215, 0), (RESOURCE_SIZE//2, RESOURCE_SIZE//2), RESOURCE_SIZE//2)
+    return coin
+
+# Load Coin Sprite (only the game screen draws coins, so the lobby never pays for it)
+get_coin_sprite = lazy_asset("Coin.png", lambda: load_image("Coin.png", (RESOURCE_SIZE, RESOURCE_SIZE)), make_fallback_coin)
 
 
 # Load Background Tile (Unchanged)
 try:
-    ground_tile = pygame.image.load("ground.png").convert()
+    ground_tile = load_image("ground.png", alpha=False)
 except pygame.error as e:
     print(f"Warning: Could not load ground.png: {e}")
-    ground_tile = pygame.Surface((32, 32)); ground_tile.fill(BACKGROUND_COLOR)
+    ground_tile = pygame.Surface((32, 32)).convert(); ground_tile.fill(BACKGROUND_COLOR)
 tile_width, tile_height = ground_tile.get_width(), ground_tile.get_height()
 
+# Pre-tile the ground once; drawing the playground is then a single blit
+background_surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+background_surface.blits([(ground_tile, (x, y)) for y in range(0, HEIGHT, tile_height) for x in range(0, WIDTH, tile_width)], doreturn=False)
+
 # --- MODIFIED: Load Player Sprite Templates ---
 try:
     # 1. Load IDLE sprites (L/R)
-    IDLE_TEMPLATE_L = pygame.image.load(PLAYER_IDLE_FILENAME).convert_alpha() 
-    IDLE_TEMPLATE_L = pygame.transform.scale(IDLE_TEMPLATE_L, (90, 110)) 
+    IDLE_TEMPLATE_L = load_image(PLAYER_IDLE_FILENAME, (90, 110))
     IDLE_TEMPLATE_R = pygame.transform.flip(IDLE_TEMPLATE_L, True, False)
     
     # 2. Load shadowless sprite (for lobby)
-    IDLE_TEMPLATE_SHADOWLESS = pygame.image.load(PLAYER_SPRITE_SHADOWLESS_FILENAME).convert_alpha()
-    IDLE_TEMPLATE_SHADOWLESS = pygame.transform.scale(IDLE_TEMPLATE_SHADOWLESS, (70, 90))
+    IDLE_TEMPLATE_SHADOWLESS = load_image(PLAYER_SPRITE_SHADOWLESS_FILENAME, (70, 90))
 
 except Exception as e:
     print(f"CRITICAL: Could not load player sprites. Check filenames (Player.png, Player without shadow.png). Error: {e}")
@@ -196,13 +320,12 @@ try:
     # --- MODIFIED: Bubble images no longer needed ---
     # chat_bubble_left_img = pygame.image.load("chat_bubble_left.png").convert_alpha()
     # chat_bubble_right_img = pygame.image.load("chat_bubble_right.png").convert_alpha()
-    chat_send_img = pygame.image.load("Send logo.png").convert_alpha()
+    chat_send_img = load_image("Send logo.png", (25, 25))
     
     # Scale them to fit
     # bubble_height = 50
     # chat_bubble_left_img = pygame.transform.scale(chat_bubble_left_img, (140, bubble_height))
     # chat_bubble_right_img = pygame.transform.scale(chat_bubble_right_img, (140, bubble_height))
-    chat_send_img = pygame.transform.scale(chat_send_img, (25, 25))
     
 except Exception as e:
     print(f"CRITICAL: Could not load chat assets. {e}")
@@ -248,85 +371,342 @@ except pygame.error as e:
     game_over_sound = DummySound() # <-- Add fallback here
     walking_sound_channel = DummySound()
 
-# --- Helper function to draw background (Unchanged) ---
+# --- Helper function to draw background ---
 def draw_playground_background():
-    # Tile the background
-    for y in range(0, HEIGHT, tile_height):
-        for x in range(0, WIDTH, tile_width):
-            window.blit(ground_tile, (x, y))
+    # The tiles were composited into background_surface at load time
+    window.blit(background_surface, (0, 0))
 
-# --- Helper function to draw outlined text (Unchanged) ---
-def draw_text_outline(text_surface, position, outline_color=(0,0,0)):
+# --- Helper function to draw outlined text ---
+def draw_text_outline(text_surface, position, outline_color=(0,0,0), target=None):
     # Helper to draw outline
+    if target is None: target = window
     x, y = position
-    # Blit the outline surfaces in 8 directions
+    # Recolor the text once for the outline
+    outline_surf = text_surface.copy()
+    # This complex fill is to preserve antialiasing
+    outline_surf.fill(outline_color, special_flags=pygame.BLEND_RGB_MULT)
+    # Blit the same outline surface in 8 directions
     for dx in [-1, 0, 1]:
         for dy in [-1, 0, 1]:
             if dx == 0 and dy == 0: continue # Don't draw center
-            # Re-render the text in black for the outline
-            outline_surf = text_surface.copy()
-            # This complex fill is to preserve antialiasing
-            outline_surf.fill(outline_color, special_flags=pygame.BLEND_RGB_MULT)
-            window.blit(outline_surf, (x + dx, y + dy))
-
-# --- "Two-Tone" color swapping function (Unchanged) ---
-def create_colored_sprite(base_sprite, new_color_tuple):
+            target.blit(outline_surf, (x + dx, y + dy))
+
+# --- Cached outlined text (outline + fill baked into one surface) ---
+OUTLINED_TEXT_CACHE_MAX = 256
+OUTLINED_TEXT_CACHE = collections.OrderedDict()
+
+def get_outlined_text(text, text_font, color, outline_color=(0,0,0)):
+    """Returns a cached surface of `text` with a 1px outline, padded by 1px on each side."""
+    key = (text, color, outline_color, id(text_font))
+    cached = OUTLINED_TEXT_CACHE.get(key)
+    if cached is None:
+        text_surface = text_font.render(text, True, color)
+        outline_surface = text_font.render(text, True, outline_color)
+        cached = pygame.Surface((text_surface.get_width() + 2, text_surface.get_height() + 2), pygame.SRCALPHA)
+        draw_text_outline(outline_surface, (1, 1), outline_color, target=cached)
+        cached.blit(text_surface, (1, 1))
+        cached = cached.convert_alpha() # Match the display format like every other cached surface
+        OUTLINED_TEXT_CACHE[key] = cached
+        if len(OUTLINED_TEXT_CACHE) > OUTLINED_TEXT_CACHE_MAX:
+            OUTLINED_TEXT_CACHE.popitem(last=False)
+    else:
+        OUTLINED_TEXT_CACHE.move_to_end(key)
+    return cached
+
+def get_label_text(text, text_font, color, offset=1, outline_color=(0,0,0)):
+    """Returns a cached surface of `text` over 4 diagonal outline copies `offset` px out, padded by `offset` on each side."""
+    key = (text, color, outline_color, id(text_font), offset)
+    cached = OUTLINED_TEXT_CACHE.get(key)
+    if cached is None:
+        text_surface = text_font.render(text, True, color)
+        outline_surface = text_font.render(text, True, outline_color)
+        size = 2 * offset
+        cached = pygame.Surface((text_surface.get_width() + size, text_surface.get_height() + size), pygame.SRCALPHA)
+        cached.blits(((outline_surface, (0, 0)), (outline_surface, (size, 0)),
+                      (outline_surface, (0, size)), (outline_surface, (size, size)),
+                      (text_surface, (offset, offset))), False)
+        cached = cached.convert_alpha()
+        OUTLINED_TEXT_CACHE[key] = cached
+        if len(OUTLINED_TEXT_CACHE) > OUTLINED_TEXT_CACHE_MAX:
+            OUTLINED_TEXT_CACHE.popitem(last=False)
+    else:
+        OUTLINED_TEXT_CACHE.move_to_end(key)
+    return cached
+
+# --- Template classification (runs once per template) ---
+def classify_template(base_sprite):
+    """Returns a (w, h) uint8 map labelling each template pixel as none/visor/body/shadow."""
+    if base_sprite is None or np is None: return None
+    rgb = pygame.surfarray.array3d(base_sprite)
+    opaque = pygame.surfarray.array_alpha(base_sprite) >= 50
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    labels = np.zeros(opaque.shape, dtype=np.uint8)
+    # These color checks are specific to the template image
+    labels[(g > 150) & (g > r) & (g > b) & opaque] = LABEL_VISOR
+    labels[(r > 150) & (r > g) & (r > b) & opaque] = LABEL_BODY
+    labels[(b > 150) & (b > r) & (b > g) & opaque] = LABEL_SHADOW
+    return labels
+
+# --- "Two-Tone" color swapping function ---
+def create_colored_sprite(base_sprite, labels, new_color_tuple):
     if base_sprite is None: return None
     colored_sprite = base_sprite.copy()
     dark_shade = (int(new_color_tuple[0] * 0.5), int(new_color_tuple[1] * 0.5), int(new_color_tuple[2] * 0.5))
-    for x in range(colored_sprite.get_width()):
-        for y in range(colored_sprite.get_height()):
-            pixel_color = colored_sprite.get_at((x, y))
-            r, g, b, a = pixel_color
-            if a < 50: continue
-            # These color checks are specific to the template image
-            is_green_visor = (g > 150 and g > r and g > b)
-            is_red_body = (r > 150 and r > g and r > b)
-            is_blue_shadow = (b > 150 and b > r and b > g)
-            if is_green_visor:
-                colored_sprite.set_at((x, y), VISOR_COLOR)
-            elif is_red_body:
-                colored_sprite.set_at((x, y), new_color_tuple)
-            elif is_blue_shadow:
-                colored_sprite.set_at((x, y), dark_shade)
+    if labels is None:
+        # Slow per-pixel fallback when NumPy isn't installed
+        for x in range(colored_sprite.get_width()):
+            for y in range(colored_sprite.get_height()):
+                pixel_color = colored_sprite.get_at((x, y))
+                r, g, b, a = pixel_color
+                if a < 50: continue
+                # These color checks are specific to the template image
+                is_green_visor = (g > 150 and g > r and g > b)
+                is_red_body = (r > 150 and r > g and r > b)
+                is_blue_shadow = (b > 150 and b > r and b > g)
+                if is_green_visor:
+                    colored_sprite.set_at((x, y), VISOR_COLOR)
+                elif is_red_body:
+                    colored_sprite.set_at((x, y), new_color_tuple)
+                elif is_blue_shadow:
+                    colored_sprite.set_at((x, y), dark_shade)
+        return colored_sprite
+
+    # Fast path: the template is already classified, so this is just three indexed assignments
+    rgb = pygame.surfarray.pixels3d(colored_sprite)
+    alpha = pygame.surfarray.pixels_alpha(colored_sprite)
+    recolor_pixels(rgb, alpha, labels, new_color_tuple)
+    del rgb, alpha # Unlock the surface before it gets blitted
     return colored_sprite
 
-# --- MODIFIED: Two cache management functions ---
+def recolor_pixels(rgb, alpha, labels, new_color_tuple):
+    """Recolors (w, h, 3) and (w, h) pixel arrays in place. Plain NumPy, so safe on a worker thread."""
+    dark_shade = (int(new_color_tuple[0] * 0.5), int(new_color_tuple[1] * 0.5), int(new_color_tuple[2] * 0.5))
+    rgb[labels == LABEL_VISOR] = VISOR_COLOR
+    rgb[labels == LABEL_BODY] = new_color_tuple[:3]
+    rgb[labels == LABEL_SHADOW] = dark_shade
+    alpha[labels != LABEL_NONE] = 255 # set_at() made these fully opaque too
+
+LABELS_L = classify_template(IDLE_TEMPLATE_L) # The right template is a mirror, so it never needs its own map
+LABELS_SHADOWLESS = classify_template(IDLE_TEMPLATE_SHADOWLESS)
+
+def create_game_sprites(color_tuple):
+    """Recolors the left-facing template once and mirrors it for the right-facing sprite."""
+    sprite_L = create_colored_sprite(IDLE_TEMPLATE_L, LABELS_L, color_tuple)
+    sprite_R = pygame.transform.flip(sprite_L, True, False) if sprite_L else None
+    return sprite_L, sprite_R
+
+def create_lobby_sprite(color_tuple):
+    return create_colored_sprite(IDLE_TEMPLATE_SHADOWLESS, LABELS_SHADOWLESS, color_tuple)
+
+# Surfaces aren't thread-safe, so the lobby template's pixels are copied out once here;
+# worker threads only recolor copies of these arrays and never touch a Surface
+LOBBY_TEMPLATE_PIXELS = ((pygame.surfarray.array3d(IDLE_TEMPLATE_SHADOWLESS), pygame.surfarray.array_alpha(IDLE_TEMPLATE_SHADOWLESS))
+                         if LABELS_SHADOWLESS is not None else None)
+
+def recolor_lobby_pixels(color_tuple):
+    """Worker-thread half of a lobby recolor: returns the recolored (rgb, alpha) arrays."""
+    rgb, alpha = LOBBY_TEMPLATE_PIXELS[0].copy(), LOBBY_TEMPLATE_PIXELS[1].copy()
+    recolor_pixels(rgb, alpha, LABELS_SHADOWLESS, color_tuple)
+    return rgb, alpha
+
+def lobby_sprite_from_pixels(pixels):
+    """Main-thread half of a lobby recolor: builds the Surface from recolor_lobby_pixels' arrays."""
+    sprite = IDLE_TEMPLATE_SHADOWLESS.copy()
+    rgb = pygame.surfarray.pixels3d(sprite)
+    alpha = pygame.surfarray.pixels_alpha(sprite)
+    rgb[...] = pixels[0]
+    alpha[...] = pixels[1]
+    del rgb, alpha # Unlock the surface before it gets blitted
+    return sprite
+
+# --- Color cache helpers (small LRU so rejoins and shared colors never recolor twice) ---
+def lookup_color_sprite(color_cache, color_tuple):
+    sprite = color_cache.get(color_tuple)
+    if sprite is not None:
+        color_cache.move_to_end(color_tuple)
+    return sprite
+
+def store_color_sprite(color_cache, color_tuple, sprite):
+    color_cache[color_tuple] = sprite
+    if len(color_cache) > COLOR_CACHE_MAX:
+        color_cache.popitem(last=False) # Drop the least recently used color
+
+def get_color_sprite(color_cache, color_tuple, create):
+    sprite = lookup_color_sprite(color_cache, color_tuple)
+    if sprite is None:
+        sprite = create(color_tuple)
+        store_color_sprite(color_cache, color_tuple, sprite)
+    return sprite
+
+# --- Background recoloring for lobby sprites ---
+# New players show a grey placeholder until their recolor finishes, so join storms don't stall the frame.
+SPRITE_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+PENDING_LOBBY_COLORS = {} # color -> Future of its recolored pixels; one job per color however many players share it
+PENDING_LOBBY_SPRITES = {} # player id -> the color it is waiting on
+PLACEHOLDER_COLOR = (128, 128, 128)
+LOBBY_PLACEHOLDER_SPRITE = create_lobby_sprite(PLACEHOLDER_COLOR)
+
+def set_lobby_sprite(player_id_str, sprite):
+    LOBBY_SPRITE_CACHE[player_id_str] = sprite
+    # Keep the chat avatars in step with the lobby sprite they were made from
+    if sprite:
+        AVATAR_SCALED[player_id_str] = pygame.transform.scale(sprite, CHAT_AVATAR_SIZE)
+        AVATAR_SCALED_FLIPPED[player_id_str] = pygame.transform.flip(AVATAR_SCALED[player_id_str], True, False)
+    else:
+        AVATAR_SCALED.pop(player_id_str, None)
+        AVATAR_SCALED_FLIPPED.pop(player_id_str, None)
+
+def collect_lobby_sprites():
+    """Swaps finished background recolors in for their placeholders. Called once per frame.
+    Returns True if any sprite changed."""
+    swapped = False
+    for color_tuple, future in list(PENDING_LOBBY_COLORS.items()):
+        if not future.done(): continue
+        del PENDING_LOBBY_COLORS[color_tuple]
+        try:
+            sprite = lobby_sprite_from_pixels(future.result())
+        except Exception as e:
+            print(f"Warning: Could not recolor sprite for color {color_tuple}: {e}")
+            sprite = None
+        if sprite is not None:
+            store_color_sprite(COLOR_CACHE_LOBBY, color_tuple, sprite)
+        for player_id_str, waiting_color in list(PENDING_LOBBY_SPRITES.items()):
+            if waiting_color != color_tuple: continue
+            del PENDING_LOBBY_SPRITES[player_id_str]
+            if sprite is not None and player_id_str in LOBBY_SPRITE_CACHE: # Player may have been cleared while we waited
+                set_lobby_sprite(player_id_str, sprite)
+                swapped = True
+    return swapped
+
+# --- Rotated lobby sprites (the bouncing players only ever show a fixed set of angles) ---
+ANGLE_STEP = 4 # Degrees between cached rotations
+ROTATED_SPRITE_CACHE = {} # player id -> (base sprite, list of rotations filled on demand)
+
+def get_rotated_sprite(player_id_str, sprite, angle):
+    entry = ROTATED_SPRITE_CACHE.get(player_id_str)
+    if entry is None or entry[0] is not sprite: # New player, or the placeholder was swapped out
+        entry = (sprite, [None] * (360 // ANGLE_STEP))
+        ROTATED_SPRITE_CACHE[player_id_str] = entry
+    rotations = entry[1]
+    idx = int(angle // ANGLE_STEP) % len(rotations)
+    rotated = rotations[idx]
+    if rotated is None:
+        rotated = rotations[idx] = pygame.transform.rotate(sprite, idx * ANGLE_STEP)
+    return rotated
+
+# --- Bouncing lobby players as parallel NumPy arrays (one row per player) ---
+# LOBBY_VISUALS stays the per-player record; while NumPy is available the arrays own the moving state.
+LOBBY_ARRAYS = None
+
+def unpack_lobby_visuals():
+    """Writes the array state back into LOBBY_VISUALS."""
+    if LOBBY_ARRAYS is None: return
+    rows = zip(LOBBY_ARRAYS["pids"], LOBBY_ARRAYS["pos"].tolist(), LOBBY_ARRAYS["vel"].tolist(), LOBBY_ARRAYS["angle"].tolist())
+    for pid_str, (x, y), (dx, dy), angle in rows:
+        visual = LOBBY_VISUALS.get(pid_str)
+        if visual is not None: # Skip players that just left
+            visual.update(x=x, y=y, dx=dx, dy=dy, angle=angle)
+
+def pack_lobby_visuals():
+    """Rebuilds the arrays from LOBBY_VISUALS. Call whenever players join or leave, never per frame."""
+    global LOBBY_ARRAYS
+    if np is None: return
+    unpack_lobby_visuals()
+    pids = list(LOBBY_VISUALS)
+    visuals = [LOBBY_VISUALS[pid_str] for pid_str in pids]
+    LOBBY_ARRAYS = {
+        "pids": pids,
+        "pos": np.array([(v["x"], v["y"]) for v in visuals], dtype=float).reshape(-1, 2),
+        "vel": np.array([(v["dx"], v["dy"]) for v in visuals], dtype=float).reshape(-1, 2),
+        "angle": np.array([v["angle"] for v in visuals], dtype=float),
+        "rotation_speed": np.array([v["rotation_speed"] for v in visuals], dtype=float),
+        # Visuals without a sprite never bounce; give them limits they can't reach
+        "max": np.array([(v["max_x"], v["max_y"]) if v["max_x"] is not None else (np.inf, np.inf) for v in visuals], dtype=float).reshape(-1, 2),
+        "min": np.array([0.0 if v["max_x"] is not None else -np.inf for v in visuals], dtype=float).reshape(-1, 1),
+    }
+
+def step_lobby_visuals():
+    """Moves, spins and bounces every lobby player by one frame."""
+    if LOBBY_ARRAYS is not None:
+        pos, vel = LOBBY_ARRAYS["pos"], LOBBY_ARRAYS["vel"]
+        pos += vel
+        LOBBY_ARRAYS["angle"] = (LOBBY_ARRAYS["angle"] + LOBBY_ARRAYS["rotation_speed"]) % 360
+        vel[(pos <= LOBBY_ARRAYS["min"]) | (pos >= LOBBY_ARRAYS["max"])] *= -1
+        return
+    for visual in LOBBY_VISUALS.values():
+        visual["x"] += visual["dx"]
+        visual["y"] += visual["dy"]
+        visual["angle"] = (visual["angle"] + visual["rotation_speed"]) % 360
+        if visual["max_x"] is not None:
+            if not 0 < visual["x"] < visual["max_x"]:
+                visual["dx"] = -visual["dx"]
+            if not 0 < visual["y"] < visual["max_y"]:
+                visual["dy"] = -visual["dy"]
+
+def iter_lobby_visuals():
+    """Yields (player id, x, y, angle) for every bouncing lobby player."""
+    if LOBBY_ARRAYS is not None:
+        return zip(LOBBY_ARRAYS["pids"], LOBBY_ARRAYS["pos"][:, 0].tolist(), LOBBY_ARRAYS["pos"][:, 1].tolist(), LOBBY_ARRAYS["angle"].tolist())
+    return ((pid_str, v["x"], v["y"], v["angle"]) for pid_str, v in LOBBY_VISUALS.items())
+
+def ingest_player_colors(players_data):
+    """JSON gives colors as lists; turn them into tuples once per update so draw code can use them as-is."""
+    for player_data in players_data.values():
+        if "color" in player_data:
+            player_data["color"] = tuple(player_data["color"])
+
+# --- Two cache management functions ---
 def update_lobby_sprite_cache(players_data):
     """Updates the LOBBY (shadowless) sprite cache."""
-    global LOBBY_SPRITE_CACHE, IDLE_TEMPLATE_SHADOWLESS
     for player_id_str, player_data in players_data.items():
         if player_id_str not in LOBBY_SPRITE_CACHE:
             new_color_tuple = tuple(player_data.get("color", (255, 255, 255))) 
-            LOBBY_SPRITE_CACHE[player_id_str] = create_colored_sprite(IDLE_TEMPLATE_SHADOWLESS, new_color_tuple)
-    for cached_id in list(LOBBY_SPRITE_CACHE.keys()):
-        if cached_id not in players_data:
-            del LOBBY_SPRITE_CACHE[cached_id]
+            if LOBBY_TEMPLATE_PIXELS is None:
+                # No NumPy: the per-pixel fallback works on Surfaces, so it has to run here on the main thread
+                sprite = get_color_sprite(COLOR_CACHE_LOBBY, new_color_tuple, create_lobby_sprite)
+            else:
+                sprite = lookup_color_sprite(COLOR_CACHE_LOBBY, new_color_tuple)
+            if sprite is None and LOBBY_TEMPLATE_PIXELS is not None:
+                if new_color_tuple not in PENDING_LOBBY_COLORS:
+                    PENDING_LOBBY_COLORS[new_color_tuple] = SPRITE_POOL.submit(recolor_lobby_pixels, new_color_tuple)
+                PENDING_LOBBY_SPRITES[player_id_str] = new_color_tuple
+                sprite = LOBBY_PLACEHOLDER_SPRITE
+            set_lobby_sprite(player_id_str, sprite)
+    # Every current player is cached by now, so a bigger cache means someone left
+    if len(LOBBY_SPRITE_CACHE) > len(players_data):
+        for player_id_str in LOBBY_SPRITE_CACHE.keys() - players_data.keys():
+            del LOBBY_SPRITE_CACHE[player_id_str]
+            AVATAR_SCALED.pop(player_id_str, None)
+            AVATAR_SCALED_FLIPPED.pop(player_id_str, None)
+            ROTATED_SPRITE_CACHE.pop(player_id_str, None)
+            PENDING_LOBBY_SPRITES.pop(player_id_str, None)
 
 def update_game_sprite_cache(players_data):
     """Updates the GAME (L & R, with animation) sprite cache."""
-    global GAME_SPRITE_CACHE_L, GAME_SPRITE_CACHE_R, IDLE_TEMPLATE_L, IDLE_TEMPLATE_R
+    global GAME_SPRITE_CACHE_L, GAME_SPRITE_CACHE_R
     
     for player_id_str, player_data in players_data.items():
         if player_id_str not in GAME_SPRITE_CACHE_L: # Check only one cache
             new_color_tuple = tuple(player_data.get("color", (255, 255, 255))) 
             
-            # Create LEFT animation frames
-            colored_idle_L = create_colored_sprite(IDLE_TEMPLATE_L, new_color_tuple)
+            # One recolor pass per color covers both LEFT and RIGHT animation frames
+            colored_idle_L, colored_idle_R = get_color_sprite(COLOR_CACHE_GAME, new_color_tuple, create_game_sprites)
             GAME_SPRITE_CACHE_L[player_id_str] = [colored_idle_L]
-            
-            # Create RIGHT animation frames
-            colored_idle_R = create_colored_sprite(IDLE_TEMPLATE_R, new_color_tuple)
             GAME_SPRITE_CACHE_R[player_id_str] = [colored_idle_R]
+            if colored_idle_R:
+                ROUND_OVER_SPRITES[player_id_str] = pygame.transform.scale(colored_idle_R, ROUND_OVER_SPRITE_SIZE)
+    if len(GAME_SPRITE_CACHE_L) > len(players_data):
+        for player_id_str in GAME_SPRITE_CACHE_L.keys() - players_data.keys():
+            del GAME_SPRITE_CACHE_L[player_id_str]
+            del GAME_SPRITE_CACHE_R[player_id_str]
+            ROUND_OVER_SPRITES.pop(player_id_str, None)
 
-    for cached_id in list(GAME_SPRITE_CACHE_L.keys()):
-        if cached_id not in players_data:
-            del GAME_SPRITE_CACHE_L[cached_id]
-            del GAME_SPRITE_CACHE_R[cached_id]
 
+# --- Text Wrapping Helper ---
+WRAP_CACHE_MAX = 512
+WRAP_CACHE = collections.OrderedDict()
 
-# --- NEW: Text Wrapping Helper ---
-def wrap_text(text, font, max_width):
+def _wrap_text_uncached(text, font, max_width):
     words = text.split(' ')
     lines = []
     current_line = ""
@@ -343,10 +723,76 @@ def wrap_text(text, font, max_width):
             lines.append(current_line.strip()) # Add what we have
             current_line = word + " "
     lines.append(current_line.strip())
+    return tuple(lines)
+
+def wrap_text(text, font, max_width):
+    """Memoized wrapper; chat history barely changes between frames."""
+    key = (text, id(font), max_width)
+    lines = WRAP_CACHE.get(key)
+    if lines is None:
+        lines = _wrap_text_uncached(text, font, max_width)
+        WRAP_CACHE[key] = lines
+        if len(WRAP_CACHE) > WRAP_CACHE_MAX:
+            WRAP_CACHE.popitem(last=False)
     return lines
 
+# --- Rendered Text Cache ---
+TEXT_CACHE_MAX = 512
+TEXT_CACHE = collections.OrderedDict()
+
+def cached_render(text_font, text, color, background=None):
+    """font.render() with the resulting surface cached per (font, text, color, background).
+    Surfaces are converted to the display format so blits take the fast path; pass an
+    opaque `background` when the text always sits on a solid box to get a plain convert().
+    Colors must be tuples (player colors are converted on ingest, see ingest_player_colors)."""
+    key = (id(text_font), text, color, background)
+    surface = TEXT_CACHE.get(key)
+    if surface is None:
+        if background is None:
+            surface = text_font.render(text, True, color).convert_alpha()
+        else:
+            surface = text_font.render(text, True, color, background).convert()
+        TEXT_CACHE[key] = surface
+        if len(TEXT_CACHE) > TEXT_CACHE_MAX:
+            TEXT_CACHE.popitem(last=False)
+    else:
+        TEXT_CACHE.move_to_end(key)
+    return surface
+
+
+# --- Rounded Box Cache (chat bubbles) ---
+ROUND_RECT_CACHE = {}
+
+def get_rounded_box(w, h, color=(255, 255, 255), radius=15):
+    """Returns a pre-drawn rounded rectangle; only a handful of bubble sizes ever occur."""
+    key = (w, h, color, radius)
+    box = ROUND_RECT_CACHE.get(key)
+    if box is None:
+        box = pygame.Surface((w, h), pygame.SRCALPHA)
+        pygame.draw.rect(box, color, (0, 0, w, h), border_radius=radius)
+        box = box.convert_alpha()
+        ROUND_RECT_CACHE[key] = box
+    return box
+
 
 # --- COMPLETELY MODIFIED: draw_chat_ui ---
+# --- Chat bubble layout (fixed by the panel width, so each message is measured once) ---
+CHAT_AVATAR_X_PADDING = 10
+CHAT_BOX_X_PADDING = 10 # Padding inside the white box
+CHAT_BOX_Y_PADDING = 10
+CHAT_NAME_BAR_HEIGHT = 20 # Space for name + timestamp
+CHAT_BOX_WIDTH = SIDE_PANEL_WIDTH - CHAT_AVATAR_SIZE[0] - CHAT_AVATAR_X_PADDING * 3
+CHAT_TEXT_WRAP_WIDTH = CHAT_BOX_WIDTH - CHAT_BOX_X_PADDING * 2
+
+def layout_chat_message(msg):
+    """Wraps a chat message and stores its lines and heights on the message dict."""
+    wrapped_lines = wrap_text(msg.get("msg", ""), chat_bubble_font, CHAT_TEXT_WRAP_WIDTH)
+    text_block_height = len(wrapped_lines) * 18 # 18px per line (font size)
+    box_height = max(text_block_height + CHAT_BOX_Y_PADDING * 2, CHAT_AVATAR_SIZE[1]) # At least as tall as avatar
+    msg["lines"] = wrapped_lines
+    msg["box_height"] = box_height
+    msg["height"] = box_height + CHAT_NAME_BAR_HEIGHT + 5 # +5 for padding
+
 def draw_chat_ui(my_player_id, chat_area_bottom): # <-- ADDED PARAMETER
     """Draws the new reference image chat UI."""
     global chat_history, is_chatting, current_chat_message, chat_input_rect, chat_send_rect
@@ -370,26 +816,30 @@ def draw_chat_ui(my_player_id, chat_area_bottom): # <-- ADDED PARAMETER
     original_clip = window.get_clip()
     window.set_clip(chat_clip_rect)
     
-    sprite_size = (35, 45)
-    avatar_x_padding = 10
-    box_x_padding = 10 # Padding inside the white box
-    box_y_padding = 10
-    
-    # Calculate available width for the box and text
-    box_width = SIDE_PANEL_WIDTH - sprite_size[0] - avatar_x_padding * 3
-    text_wrap_width = box_width - box_x_padding * 2
+    sprite_size = CHAT_AVATAR_SIZE
+    avatar_x_padding = CHAT_AVATAR_X_PADDING
+    box_x_padding = CHAT_BOX_X_PADDING
+    box_y_padding = CHAT_BOX_Y_PADDING
+    box_width = CHAT_BOX_WIDTH
+    name_bar_height = CHAT_NAME_BAR_HEIGHT
     
-    # --- NEW: Initialize variable to prevent UnboundLocalError ---
-    message_total_height = 0 
+    text_blits = [] # Bubble text lines, drawn in one batch after the loop
     
     # Loop through messages *in reverse*
     for msg in reversed(chat_history):
         msg_type = msg.get("type", "chat")
         
         if msg_type == "system":
-            # --- Draw System Message (Unchanged) ---
+            # --- Skip System Message if it's outside the visible area ---
+            if y_offset - 15 > chat_area_bottom: # Still below the view (scrolled up)
+                y_offset -= 30
+                continue
+            if y_offset + 15 < chat_area_top: # Everything older is above the view
+                break
+            
+            # --- Draw System Message ---
             text = msg.get("msg", "")
-            system_surface = chat_system_font.render(text, True, (150, 150, 150))
+            system_surface = cached_render(chat_system_font, text, (150, 150, 150))
             system_rect = system_surface.get_rect(center=(WIDTH + SIDE_PANEL_WIDTH // 2, y_offset))
             window.blit(system_surface, system_rect)
             y_offset -= 30 # Move up for next message
@@ -399,26 +849,28 @@ def draw_chat_ui(my_player_id, chat_area_bottom): # <-- ADDED PARAMETER
             sender_id = str(msg.get("sender_id", 0))
             is_my_message = (sender_id == str(my_player_id))
             
-            # 1. Get text and wrap it
-            message_text = msg.get("msg", "")
-            wrapped_lines = wrap_text(message_text, chat_bubble_font, text_wrap_width)
-            
-            # 2. Calculate heights
-            text_block_height = len(wrapped_lines) * 18 # 18px per line (font size)
-            box_height = text_block_height + (box_y_padding * 2)
-            if box_height < sprite_size[1]: # Ensure box is at least as tall as avatar
-                box_height = sprite_size[1]
-                
-            name_bar_height = 20 # Space for name + timestamp
-            message_total_height = box_height + name_bar_height + 5 # +5 for padding
+            # 1-2. Wrapped lines and heights are measured once per message
+            if "height" not in msg:
+                layout_chat_message(msg)
+            wrapped_lines = msg["lines"]
+            box_height = msg["box_height"]
+            message_total_height = msg["height"]
             
             # 3. Move Y-offset up
             y_offset -= message_total_height
             
-            # 4. Get Avatar
-            sprite = LOBBY_SPRITE_CACHE.get(sender_id)
-            if sprite:
-                sprite = pygame.transform.scale(sprite, sprite_size)
+            # Skip all rendering for messages outside the visible area
+            if y_offset > chat_area_bottom: # Still below the view (scrolled up)
+                y_offset -= 10
+                continue
+            if y_offset + message_total_height < chat_area_top: # Everything older is above the view
+                break
+            
+            # 4. Get Avatar (already scaled; flipped for my own messages)
+            if is_my_message:
+                sprite = AVATAR_SCALED_FLIPPED.get(sender_id)
+            else:
+                sprite = AVATAR_SCALED.get(sender_id)
             
             # 5. Define rects based on sender
             name_y = y_offset + 3
@@ -430,29 +882,27 @@ def draw_chat_ui(my_player_id, chat_area_bottom): # <-- ADDED PARAMETER
                 box_x = WIDTH + SIDE_PANEL_WIDTH - avatar_x_padding - sprite_size[0] - box_width - 5
                 
                 # Draw Name (You)
-                name_surface = chat_name_font.render(msg.get("name", "Me"), True, tuple(msg.get("color", TEXT_COLOR)))
+                name_surface = cached_render(chat_name_font, msg.get("name", "Me"), msg.get("color", TEXT_COLOR))
                 name_rect = name_surface.get_rect(topright=(avatar_x + sprite_size[0], name_y))
                 window.blit(name_surface, name_rect)
                 
                 # Draw Timestamp
-                ts_surface = chat_timestamp_font.render(msg.get("timestamp", ""), True, (150, 150, 150))
+                ts_surface = cached_render(chat_timestamp_font, msg.get("timestamp", ""), (150, 150, 150))
                 ts_rect = ts_surface.get_rect(topright=(name_rect.left - 5, name_y + 2))
                 window.blit(ts_surface, ts_rect)
                 
                 # Draw Avatar
                 if sprite:
-                    # --- NEW: Flip avatar for sender ---
-                    flipped_sprite = pygame.transform.flip(sprite, True, False)
-                    window.blit(flipped_sprite, (avatar_x, box_y))
+                    window.blit(sprite, (avatar_x, box_y))
                 
                 # Draw Box
-                pygame.draw.rect(window, (255, 255, 255), (box_x, box_y, box_width, box_height), border_radius=15)
+                window.blit(get_rounded_box(box_width, box_height), (box_x, box_y))
                 
                 # Draw Wrapped Text
                 line_y_offset = box_y + box_y_padding
                 for line in wrapped_lines:
-                    line_surface = chat_bubble_font.render(line, True, (0, 0, 0)) # Black text
-                    window.blit(line_surface, (box_x + box_x_padding, line_y_offset))
+                    line_surface = cached_render(chat_bubble_font, line, (0, 0, 0), (255, 255, 255)) # Black text on the white box
+                    text_blits.append((line_surface, (box_x + box_x_padding, line_y_offset)))
                     line_y_offset += 18 # Match font size
 
             else:
@@ -461,12 +911,12 @@ def draw_chat_ui(my_player_id, chat_area_bottom): # <-- ADDED PARAMETER
                 box_x = avatar_x + sprite_size[0] + 5
                 
                 # Draw Name
-                name_surface = chat_name_font.render(msg.get("name", "Player"), True, tuple(msg.get("color", TEXT_COLOR)))
+                name_surface = cached_render(chat_name_font, msg.get("name", "Player"), msg.get("color", TEXT_COLOR))
                 name_rect = name_surface.get_rect(topleft=(box_x, name_y))
                 window.blit(name_surface, name_rect)
                 
                 # Draw Timestamp
-                ts_surface = chat_timestamp_font.render(msg.get("timestamp", ""), True, (150, 150, 150))
+                ts_surface = cached_render(chat_timestamp_font, msg.get("timestamp", ""), (150, 150, 150))
                 ts_rect = ts_surface.get_rect(topleft=(name_rect.right + 5, name_y + 2))
                 window.blit(ts_surface, ts_rect)
                 
@@ -475,25 +925,45 @@ def draw_chat_ui(my_player_id, chat_area_bottom): # <-- ADDED PARAMETER
                     window.blit(sprite, (avatar_x, box_y))
                 
                 # Draw Box
-                pygame.draw.rect(window, (255, 255, 255), (box_x, box_y, box_width, box_height), border_radius=15)
+                window.blit(get_rounded_box(box_width, box_height), (box_x, box_y))
                 
                 # Draw Wrapped Text
                 line_y_offset = box_y + box_y_padding
                 for line in wrapped_lines:
-                    line_surface = chat_bubble_font.render(line, True, (0, 0, 0)) # Black text
-                    window.blit(line_surface, (box_x + box_x_padding, line_y_offset))
+                    line_surface = cached_render(chat_bubble_font, line, (0, 0, 0), (255, 255, 255)) # Black text on the white box
+                    text_blits.append((line_surface, (box_x + box_x_padding, line_y_offset)))
                     line_y_offset += 18 # Match font size
 
             y_offset -= 10 # Padding between messages
-
-        # --- MODIFIED: Stop drawing if we go off-screen ---
-        if y_offset < chat_area_top - message_total_height: # Give a buffer
-            break
             
+    # Messages never overlap, so all bubble text can go out in one call
+    window.blits(text_blits, doreturn=False)
+
     # --- NEW: Restore the original clipping rect ---
     window.set_clip(original_clip)
 
 
+# --- Server message pump ---
+INBOX_MAX = 64
+server_inbox = collections.deque(maxlen=INBOX_MAX) # Decoded server messages waiting to be handled
+
+async def _recv_loop(websocket, inbox):
+    """Decodes every incoming server message into `inbox` until the connection drops."""
+    resync_requested = False
+    try:
+        async for raw in websocket:
+            data = json_loads(raw)
+            if data.get("type") == "update":
+                resync_requested = False # A full update replaces whatever was dropped before it
+            elif len(inbox) == inbox.maxlen and not resync_requested:
+                # The oldest message is about to be dropped; if it was a delta, only a full update repairs the state
+                resync_requested = True
+                await websocket.send(RESYNC_MESSAGE)
+            inbox.append(data)
+    except (websockets.exceptions.ConnectionClosed, json.JSONDecodeError):
+        pass # The frame loop sees the finished task and bails out
+
+
 # --- MODIFIED: lobby_loop (returns data) ---
 async def lobby_loop(websocket, my_player_id):
     global font, KNOWN_PLAYER_COUNT, click_sound, connect_sound, disconnect_sound
@@ -551,436 +1021,479 @@ async def lobby_loop(websocket, my_player_id):
     # --- NEW: Lobby-specific chat rects (at the bottom) ---
     lobby_chat_input_rect = pygame.Rect(WIDTH + 10, HEIGHT - 50, SIDE_PANEL_WIDTH - 55, 40)
     lobby_chat_send_rect = pygame.Rect(lobby_chat_input_rect.right + 5, HEIGHT - 50, 40, 40)
-
-
-    lobby_running = True
-    while lobby_running:
-        mouse_pos = pygame.mouse.get_pos()
-        mouse_pressed = pygame.mouse.get_pressed()
+    chat_history_area_rect = pygame.Rect(WIDTH, 60, SIDE_PANEL_WIDTH, lobby_chat_input_rect.top - 60) # From tabs to input box
+    chat_input_clip_rect = pygame.Rect(lobby_chat_input_rect.left + 15, lobby_chat_input_rect.top, lobby_chat_input_rect.width - 20, lobby_chat_input_rect.height)
+
+    # --- Static labels (rendered once instead of every frame) ---
+    lobby_tab_text = panel_tab_font.render("Lobby", True, TAB_TEXT_COLOR)
+    lobby_tab_text_rect = lobby_tab_text.get_rect(center=lobby_tab_rect.center)
+    chat_tab_text = panel_tab_font.render("Chat", True, TAB_TEXT_COLOR)
+    chat_tab_text_rect = chat_tab_text.get_rect(center=chat_tab_rect.center)
+    active_title_surface = panel_tab_font.render("Active Player", True, TEXT_COLOR)
+
+    # Main screen title with a drop shadow
+    TITLE_TEXT = "Coin Chaos"
+    SHADOW_COLOR = (0, 0, 0) # Black shadow
+    TITLE_COLOR = (255, 255, 255) # White text
+    SHADOW_OFFSET = 5
+    TITLE_POSITION = (WIDTH // 2, 150)
+    title_shadow_surface = pixel_title_font.render(TITLE_TEXT, True, SHADOW_COLOR)
+    title_shadow_rect = title_shadow_surface.get_rect(center=(TITLE_POSITION[0] + SHADOW_OFFSET, TITLE_POSITION[1] + SHADOW_OFFSET))
+    title_surface = pixel_title_font.render(TITLE_TEXT, True, TITLE_COLOR)
+    title_rect = title_surface.get_rect(center=TITLE_POSITION)
+
+    # Timer select screen title, subtitle and fixed timer glyphs
+    timer_title_surface = pixel_title_font_small.render("Coin Chaos", True, TEXT_COLOR)
+    timer_title_rect = timer_title_surface.get_rect(center=(WIDTH // 2, 100))
+    timer_shadow_surface = pixel_title_font_small.render("Coin Chaos", True, (0,0,0))
+    timer_shadow_rect = timer_shadow_surface.get_rect(center=(timer_title_rect.centerx + 3, timer_title_rect.centery + 3))
+    subtitle_surface = panel_title_font.render("Set Timer", True, TEXT_COLOR)
+    subtitle_rect = subtitle_surface.get_rect(center=(WIDTH // 2, 200))
+    sec_text = timer_number_font.render("00", True, (100, 100, 100)) # Disabled seconds
+    sec_text_rect = sec_text.get_rect(center=sec_box_rect.center)
+    colon_text = timer_number_font.render(":", True, TEXT_COLOR)
+    colon_text_rect = colon_text.get_rect(center=(WIDTH // 2, min_box_rect.centery))
+
+    # Timer select screen vertex lists (back arrow and the four timer arrows)
+    back_arrow_points = [(back_button_rect.centerx + 10, back_button_rect.top + 15), 
+                         (back_button_rect.left + 15, back_button_rect.centery), 
+                         (back_button_rect.centerx + 10, back_button_rect.bottom - 15)]
+    min_up_points = [(min_up_rect.centerx, min_up_rect.top), (min_up_rect.left + 20, min_up_rect.bottom), (min_up_rect.right - 20, min_up_rect.bottom)]
+    min_down_points = [(min_down_rect.centerx, min_down_rect.bottom), (min_down_rect.left + 20, min_down_rect.top), (min_down_rect.right - 20, min_down_rect.top)]
+    sec_up_points = [(sec_up_rect.centerx, sec_up_rect.top), (sec_up_rect.left + 20, sec_up_rect.bottom), (sec_up_rect.right - 20, sec_up_rect.bottom)]
+    sec_down_points = [(sec_down_rect.centerx, sec_down_rect.bottom), (sec_down_rect.left + 20, sec_down_rect.top), (sec_down_rect.right - 20, sec_down_rect.top)]
+
+    # Buttons with hover states; all tested once per frame with plain attribute compares
+    hover_rects = {"start": lobby_start_button_rect, "leave": leave_button_rect, "back": back_button_rect,
+                   "min_up": min_up_rect, "min_down": min_down_rect, "timer_start": timer_start_button_rect}
+
+    # --- Dirty-rect state for the main screen ---
+    # Only the ground under the bouncing players, the UI drawn over the playground and the panel change per frame.
+    wait_text_rect = get_outlined_text("Waiting for host to start...", font, TEXT_COLOR).get_rect(center=lobby_start_button_rect.center)
+    main_ui_rects = [title_shadow_rect.union(title_rect), lobby_start_button_rect.union(wait_text_rect), leave_button_rect]
+    prev_sprite_rects = []
+    full_redraw = True # Repaint everything on the first frame and whenever we come back from another screen
+    # The timer select screen has no animation, so it is only redrawn when something actually changed
+    needs_redraw = True
+    last_blink_phase = None
+
+
+    # Network reads happen in a background task so the frame loop never blocks on recv()
+    recv_task = asyncio.create_task(_recv_loop(websocket, server_inbox))
+    next_frame_time = time.monotonic()
+    try:
+        lobby_running = True
+        while lobby_running:
+            # Sleep (not clock.tick) until this frame is due, so the receive task keeps reading meanwhile
+            frame_delay = next_frame_time - time.monotonic()
+            if frame_delay < 0: # Fell behind (slow frame); don't try to catch up with a burst of frames
+                next_frame_time -= frame_delay
+                frame_delay = 0
+            await asyncio.sleep(frame_delay)
+            next_frame_time += FRAME_INTERVAL
+
+            mouse_pos = pygame.mouse.get_pos()
+            mouse_pressed = pygame.mouse.get_pressed()
+            mouse_x, mouse_y = mouse_pos
+            hovered = {name: r.x <= mouse_x < r.x + r.w and r.y <= mouse_y < r.y + r.h for name, r in hover_rects.items()}
+            if collect_lobby_sprites(): needs_redraw = True
         
-        try:
-            response = await asyncio.wait_for(websocket.recv(), timeout=WEBSOCKET_SEND_TIMEOUT)
-            data = json.loads(response)
-
-            # --- NEW: Handle NEW Chat Broadcast ---
-            if data.get("type") == "chat_broadcast":
-                chat_history.append({
-                    "type": "chat",
-                    "sender_id": data.get("sender_id"),
-                    "name": data.get("sender_name", "System"),
-                    "color": data.get("sender_color", (200, 200, 200)),
-                    "msg": data.get("message", ""),
-                    "timestamp": data.get("timestamp", "")
-                })
-                if len(chat_history) > CHAT_HISTORY_MAX:
-                    chat_history.pop(0)
-                if not is_chatting:
-                    chat_message_sound.play()
-                continue
-            # --- NEW: Handle System Message ---
-            elif data.get("type") == "system_message":
-                chat_history.append({
-                    "type": "system",
-                    "msg": data.get("message", ""),
-                    "timestamp": data.get("timestamp", "")
-                })
-                if len(chat_history) > CHAT_HISTORY_MAX:
-                    chat_history.pop(0)
-                #chat_message_sound.play()
-                continue
-            # --- END NEW ---
-
-            players = data.get("players", {})
-            host_player_id = data.get("host_player_id", 0) 
-            update_lobby_sprite_cache(players)
-            new_player_count = len(players)
-            for pid_str in players:
-                if pid_str not in LOBBY_VISUALS:
-                    LOBBY_VISUALS[pid_str] = {
-                        "x": random.randint(0, WIDTH - PLAYER_SIZE),
-                        "y": random.randint(0, HEIGHT - PLAYER_SIZE),
-                        "dx": random.choice([-1, 1, 1.5, -1.5]), 
-                        "dy": random.choice([-1, 1, 1.5, -1.5]),
-                        "angle": random.randint(0, 360),
-                        "rotation_speed": random.choice([-2, -1, 1, 2])
-                    }
-            for pid_str in list(LOBBY_VISUALS.keys()):
-                if pid_str not in players:
-                    del LOBBY_VISUALS[pid_str]
-            if new_player_count > KNOWN_PLAYER_COUNT: connect_sound.play()
-            elif new_player_count < KNOWN_PLAYER_COUNT: disconnect_sound.play()
-            KNOWN_PLAYER_COUNT = new_player_count
+            # --- Drain everything the receive task has queued since last frame ---
+            while server_inbox:
+                data = server_inbox.popleft()
+                needs_redraw = True
+
+                # --- NEW: Handle NEW Chat Broadcast ---
+                if data.get("type") == "chat_broadcast":
+                    chat_history.append({
+                        "type": "chat",
+                        "sender_id": data.get("sender_id"),
+                        "name": data.get("sender_name", "System"),
+                        "color": tuple(data.get("sender_color", (200, 200, 200))),
+                        "msg": data.get("message", ""),
+                        "timestamp": data.get("timestamp", "")
+                    })
+                    if not is_chatting:
+                        chat_message_sound.play()
+                    continue
+                # --- NEW: Handle System Message ---
+                elif data.get("type") == "system_message":
+                    chat_history.append({
+                        "type": "system",
+                        "msg": data.get("message", ""),
+                        "timestamp": data.get("timestamp", "")
+                    })
+                    #chat_message_sound.play()
+                    continue
+                # --- END NEW ---
+                elif data.get("type") == "delta":
+                    continue # Only sent mid-game; the lobby always gets full updates
+
+                players = data.get("players", {})
+                ingest_player_colors(players)
+                host_player_id = data.get("host_player_id", 0) 
+                update_lobby_sprite_cache(players)
+                new_player_count = len(players)
+                roster_changed = False
+                for pid_str in players:
+                    if pid_str not in LOBBY_VISUALS:
+                        roster_changed = True
+                        sprite = LOBBY_SPRITE_CACHE.get(pid_str) # Placeholder and recolored sprites share one size
+                        w, h = sprite.get_size() if sprite else (None, None)
+                        LOBBY_VISUALS[pid_str] = {
+                            "x": random.randint(0, WIDTH - PLAYER_SIZE),
+                            "y": random.randint(0, HEIGHT - PLAYER_SIZE),
+                            "dx": random.choice([-1, 1, 1.5, -1.5]), 
+                            "dy": random.choice([-1, 1, 1.5, -1.5]),
+                            "angle": random.randint(0, 360),
+                            "rotation_speed": random.choice([-2, -1, 1, 2]),
+                            # Bounce limits, worked out once instead of from the sprite size every frame
+                            "max_x": WIDTH - w if sprite else None,
+                            "max_y": HEIGHT - h if sprite else None
+                        }
+                for pid_str in list(LOBBY_VISUALS.keys()):
+                    if pid_str not in players:
+                        roster_changed = True
+                        del LOBBY_VISUALS[pid_str]
+                        ROTATED_SPRITE_CACHE.pop(pid_str, None)
+                if roster_changed:
+                    pack_lobby_visuals()
+                if new_player_count > KNOWN_PLAYER_COUNT: connect_sound.play()
+                elif new_player_count < KNOWN_PLAYER_COUNT: disconnect_sound.play()
+                KNOWN_PLAYER_COUNT = new_player_count
             
-            current_game_state = data.get("game_state")
-            if current_game_state == "playing" or current_game_state == "countdown":
-                lobby_running = False
-                return data 
-
-        except asyncio.TimeoutError:
-            pass 
-        except (websockets.exceptions.ConnectionClosed, json.JSONDecodeError):
-            print("Connection error in lobby."); return None 
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT: pygame.quit(); return None
+                current_game_state = data.get("game_state")
+                if current_game_state == "playing" or current_game_state == "countdown":
+                    lobby_running = False
+                    return data 
+
+            if recv_task.done() and not server_inbox:
+                print("Connection error in lobby."); return None 
+
+            for event in pygame.event.get():
+                # One type dispatch per event; the branches below are mutually exclusive
+                event_type = event.type
+                needs_redraw = True # Clicks, keys and mouse motion (hover) can all change the screen
+                if event_type == pygame.QUIT: pygame.quit(); return None
             
-            # --- Chat Input Handling (Shared) ---
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_RETURN:
-                    if is_chatting:
-                        # Send message
-                        if current_chat_message:
-                            try:
-                                await websocket.send(json.dumps({"type": "chat", "message": current_chat_message}))
+                # --- Chat Input Handling (Shared) ---
+                elif event_type == pygame.KEYDOWN:
+                    if event.key == pygame.K_RETURN:
+                        if is_chatting:
+                            # Send message
+                            if current_chat_message:
+                                try:
+                                    await websocket.send(json_dumps({"type": "chat", "message": current_chat_message}))
                                 
-                                # --- NEW: Local Echo ---
-                                my_player_data = players.get(str(my_player_id), {})
-                                chat_history.append({
-                                    "type": "chat",
-                                    "sender_id": str(my_player_id),
-                                    "name": my_player_data.get("name", "Me"),
-                                    "color": my_player_data.get("color", TEXT_COLOR),
-                                    "msg": current_chat_message,
-                                    "timestamp": get_chat_timestamp()
-                                })
-                                if len(chat_history) > CHAT_HISTORY_MAX:
-                                    chat_history.pop(0)
-                                chat_message_sound.play() # <-- NEW: Play sound on local echo
-                                # --- END NEW ---
+                                    # --- NEW: Local Echo ---
+                                    my_player_data = players.get(str(my_player_id), {})
+                                    chat_history.append({
+                                        "type": "chat",
+                                        "sender_id": str(my_player_id),
+                                        "name": my_player_data.get("name", "Me"),
+                                        "color": my_player_data.get("color", TEXT_COLOR),
+                                        "msg": current_chat_message,
+                                        "timestamp": get_chat_timestamp()
+                                    })
+                                    chat_message_sound.play() # <-- NEW: Play sound on local echo
+                                    # --- END NEW ---
                                 
-                            except websockets.exceptions.ConnectionClosed:
-                                print("Failed to send chat."); lobby_running = False; return None
-                        current_chat_message = ""
-                        is_chatting = False
-                    else:
-                        # Activate chat (if chat tab is active and on main screen)
-                        # --- MODIFIED: Allow chat activation on timer screen too ---
-                        if active_panel_tab == "chat": # and current_lobby_screen == "main":
-                            is_chatting = True
-                elif is_chatting:
-                    if event.key == pygame.K_BACKSPACE:
-                        current_chat_message = current_chat_message[:-1]
-                    elif event.unicode.isprintable(): # Only add printable chars
-                        # Limit chat message length
-                        if chat_input_font.size(current_chat_message + event.unicode)[0] < lobby_chat_input_rect.width - 20: # Use lobby rect width
-                            current_chat_message += event.unicode
+                                except websockets.exceptions.ConnectionClosed:
+                                    print("Failed to send chat."); lobby_running = False; return None
+                            clear_chat_input()
+                            is_chatting = False
+                        else:
+                            # Activate chat (if chat tab is active and on main screen)
+                            # --- MODIFIED: Allow chat activation on timer screen too ---
+                            if active_panel_tab == "chat": # and current_lobby_screen == "main":
+                                is_chatting = True
+                    elif is_chatting:
+                        if event.key == pygame.K_BACKSPACE:
+                            erase_chat_char()
+                        elif event.unicode.isprintable(): # Only add printable chars
+                            # Limit chat message length
+                            type_chat_char(event.unicode, lobby_chat_input_rect.width - 20) # Use lobby rect width
             
-            # --- NEW: Scroll Wheel Handling (Lobby) ---
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                # Define the chat history area
-                chat_history_area_rect = pygame.Rect(WIDTH, 60, SIDE_PANEL_WIDTH, lobby_chat_input_rect.top - 60) # From tabs to input box
-                
-                if active_panel_tab == 'chat' and chat_history_area_rect.collidepoint(event.pos):
-                    if event.button == 4: # Scroll Up
-                        chat_scroll_offset = max(0, chat_scroll_offset - 1)
-                        continue # This click was for scrolling
-                    elif event.button == 5: # Scroll Down
-                        chat_scroll_offset += 1
-                        continue # This click was for scrolling
-                    # --- BUG FIX: Removed 'continue' from here. ---
-                    # A left-click (button 1) should now fall through.
-
-            # --- MOUSEBUTTONDOWN HANDLER (Split by screen state) ---
-            if event.type == pygame.MOUSEBUTTONDOWN:
+                elif event_type == pygame.MOUSEBUTTONDOWN:
+                    # --- NEW: Scroll Wheel Handling (Lobby) ---
+                    if active_panel_tab == 'chat' and chat_history_area_rect.collidepoint(event.pos):
+                        if event.button == 4: # Scroll Up
+                            chat_scroll_offset = max(0, chat_scroll_offset - 1)
+                            continue # This click was for scrolling
+                        elif event.button == 5: # Scroll Down
+                            chat_scroll_offset += 1
+                            continue # This click was for scrolling
+                        # --- BUG FIX: Removed 'continue' from here. ---
+                        # A left-click (button 1) should now fall through.
+
+                    # --- MOUSEBUTTONDOWN HANDLER (Split by screen state) ---
                 
-                # --- 1. Handle Panel Clicks FIRST (Tabs & Chat UI) ---
-                # These should work on BOTH screens.
+                    # --- 1. Handle Panel Clicks FIRST (Tabs & Chat UI) ---
+                    # These should work on BOTH screens.
                 
-                # 1a. Tab Clicks
-                if lobby_tab_rect.collidepoint(event.pos):
-                    active_panel_tab = "lobby"
-                    is_chatting = False # Deactivate chat when switching tabs
-                    click_sound.play()
-                    continue # Done with this click
-                if chat_tab_rect.collidepoint(event.pos):
-                    active_panel_tab = "chat"
-                    is_chatting = True # Auto-focus chat
-                    click_sound.play()
-                    continue # Done with this click
-
-                # 1b. Chat UI Clicks
-                if is_chatting:
-                    if lobby_chat_send_rect.collidepoint(event.pos): # <-- USE LOBBY RECT
-                        if current_chat_message:
-                            try:
-                                await websocket.send(json.dumps({"type": "chat", "message": current_chat_message}))
+                    # 1a. Tab Clicks
+                    if lobby_tab_rect.collidepoint(event.pos):
+                        active_panel_tab = "lobby"
+                        is_chatting = False # Deactivate chat when switching tabs
+                        click_sound.play()
+                        continue # Done with this click
+                    if chat_tab_rect.collidepoint(event.pos):
+                        active_panel_tab = "chat"
+                        is_chatting = True # Auto-focus chat
+                        click_sound.play()
+                        continue # Done with this click
+
+                    # 1b. Chat UI Clicks
+                    if is_chatting:
+                        if lobby_chat_send_rect.collidepoint(event.pos): # <-- USE LOBBY RECT
+                            if current_chat_message:
+                                try:
+                                    await websocket.send(json_dumps({"type": "chat", "message": current_chat_message}))
                                 
-                                # --- NEW: Local Echo ---
-                                my_player_data = players.get(str(my_player_id), {})
-                                chat_history.append({
-                                    "type": "chat",
-                                    "sender_id": str(my_player_id),
-                                    "name": my_player_data.get("name", "Me"),
-                                    "color": my_player_data.get("color", TEXT_COLOR),
-                                    "msg": current_chat_message,
-                                    "timestamp": get_chat_timestamp()
-                                })
-                                if len(chat_history) > CHAT_HISTORY_MAX:
-                                    chat_history.pop(0)
-                                chat_message_sound.play() # <-- NEW: Play sound on local echo
-                                # --- END NEW ---
+                                    # --- NEW: Local Echo ---
+                                    my_player_data = players.get(str(my_player_id), {})
+                                    chat_history.append({
+                                        "type": "chat",
+                                        "sender_id": str(my_player_id),
+                                        "name": my_player_data.get("name", "Me"),
+                                        "color": my_player_data.get("color", TEXT_COLOR),
+                                        "msg": current_chat_message,
+                                        "timestamp": get_chat_timestamp()
+                                    })
+                                    chat_message_sound.play() # <-- NEW: Play sound on local echo
+                                    # --- END NEW ---
                                 
-                            except websockets.exceptions.ConnectionClosed:
-                                print("Failed to send chat."); lobby_running = False; return None
-                        current_chat_message = ""
-                        continue 
+                                except websockets.exceptions.ConnectionClosed:
+                                    print("Failed to send chat."); lobby_running = False; return None
+                            clear_chat_input()
+                            continue 
                     
-                    if lobby_chat_input_rect.collidepoint(event.pos): # <-- USE LOBBY RECT
-                        continue # Just focusing chat
+                        if lobby_chat_input_rect.collidepoint(event.pos): # <-- USE LOBBY RECT
+                            continue # Just focusing chat
                     
-                    # Clicked outside chat UI
-                    is_chatting = False
-                    # Let click fall through
+                        # Clicked outside chat UI
+                        is_chatting = False
+                        # Let click fall through
                 
-                # --- 2. Handle Screen-Specific Clicks ---
-                if current_lobby_screen == "main":
-                    # --- 1. Handle Main Lobby Clicks ---
+                    # --- 2. Handle Screen-Specific Clicks ---
+                    if current_lobby_screen == "main":
+                        # --- 1. Handle Main Lobby Clicks ---
                     
-                    # 1c. Main Buttons (Leave, Start)
-                    if leave_button_rect.collidepoint(event.pos):
-                        click_sound.play(); return None
+                        # 1c. Main Buttons (Leave, Start)
+                        if leave_button_rect.collidepoint(event.pos):
+                            click_sound.play(); return None
                         
-                    if my_player_id == host_player_id: 
-                        if lobby_start_button_rect.collidepoint(event.pos):
-                            click_sound.play() 
-                            # --- MODIFIED: Switch to timer screen ---
-                            current_lobby_screen = "timer_select"
-                            # is_chatting = False # No longer needed, panel is always active
-                            continue # Stop processing click
-
-                elif current_lobby_screen == "timer_select":
-                    # --- 2. Handle Timer Select Screen Clicks ---
+                        if my_player_id == host_player_id: 
+                            if lobby_start_button_rect.collidepoint(event.pos):
+                                click_sound.play() 
+                                # --- MODIFIED: Switch to timer screen ---
+                                current_lobby_screen = "timer_select"
+                                # is_chatting = False # No longer needed, panel is always active
+                                continue # Stop processing click
+
+                    elif current_lobby_screen == "timer_select":
+                        # --- 2. Handle Timer Select Screen Clicks ---
                     
-                    if back_button_rect.collidepoint(event.pos):
-                        current_lobby_screen = "main"
-                        click_sound.play()
-                        continue
-
-                    if min_up_rect.collidepoint(event.pos):
-                        selected_minutes = min(99, selected_minutes + 1)
-                        click_sound.play()
-                        continue
-
-                    if min_down_rect.collidepoint(event.pos):
-                        selected_minutes = max(1, selected_minutes - 1)
-                        click_sound.play()
-                        continue
+                        if back_button_rect.collidepoint(event.pos):
+                            current_lobby_screen = "main"
+                            click_sound.play()
+                            continue
+
+                        if min_up_rect.collidepoint(event.pos):
+                            selected_minutes = min(99, selected_minutes + 1)
+                            click_sound.play()
+                            continue
+
+                        if min_down_rect.collidepoint(event.pos):
+                            selected_minutes = max(1, selected_minutes - 1)
+                            click_sound.play()
+                            continue
                         
-                    if timer_start_button_rect.collidepoint(event.pos):
-                        click_sound.play() 
-                        try:
-                            # --- MODIFIED: Send selected time ---
-                            await websocket.send(json.dumps({"type": "start_game", "duration": selected_minutes}))
-                        except websockets.exceptions.ConnectionClosed:
-                            print("Failed to send start command."); return None 
-                        # Loop will exit on its own when server sends "countdown" state
-                        continue
-            # --- END OF MOUSEBUTTONDOWN HANDLER ---
+                        if timer_start_button_rect.collidepoint(event.pos):
+                            click_sound.play() 
+                            try:
+                                # --- MODIFIED: Send selected time ---
+                                await websocket.send(json_dumps({"type": "start_game", "duration": selected_minutes}))
+                            except websockets.exceptions.ConnectionClosed:
+                                print("Failed to send start command."); return None 
+                            # Loop will exit on its own when server sends "countdown" state
+                            continue
+                # --- END OF MOUSEBUTTONDOWN HANDLER ---
                         
-        # --- Player Bouncing Logic (Only for main screen) ---
-        if current_lobby_screen == "main":
-            for pid_str, visual in LOBBY_VISUALS.items():
-                visual["x"] += visual["dx"]
-                visual["y"] += visual["dy"]
-                visual["angle"] = (visual["angle"] + visual["rotation_speed"]) % 360
-                sprite = LOBBY_SPRITE_CACHE.get(pid_str) 
-                if sprite:
-                    w, h = sprite.get_size()
-                    if visual["x"] <= 0 or visual["x"] >= WIDTH - w:
-                        visual["dx"] *= -1
-                    if visual["y"] <= 0 or visual["y"] >= HEIGHT - h:
-                        visual["dy"] *= -1
+            blink_phase = int(time.monotonic() * 2) if is_chatting and active_panel_tab == "chat" else None
+            if blink_phase != last_blink_phase: # The chat cursor blinked
+                needs_redraw = True
+                last_blink_phase = blink_phase
+
+            # --- Player Bouncing Logic (Only for main screen) ---
+            if current_lobby_screen == "main":
+                step_lobby_visuals()
+            elif not needs_redraw:
+                # Nothing changed on the static timer select screen; skip drawing this frame
+                continue
             
-        # --- DRAWING SECTION (Split by screen state) ---
+            # --- DRAWING SECTION (Split by screen state) ---
         
-        # --- 1. Draw Background (Screen-specific) ---
-        if current_lobby_screen == "main":
-            # --- 1. Draw Main Lobby Screen ---
-            draw_playground_background()
+            # --- 1. Draw Background (Screen-specific) ---
+            sprite_rects = []
+            if current_lobby_screen == "main":
+                # --- 1. Draw Main Lobby Screen ---
+                if full_redraw:
+                    draw_playground_background()
+                else:
+                    # Restore the ground only where last frame's players and the overlaid UI were
+                    for dirty_rect in prev_sprite_rects + main_ui_rects:
+                        dirty_rect = dirty_rect.clip(playground_rect)
+                        window.blit(background_surface, dirty_rect, dirty_rect)
             
-            # Draw bouncing players
-            for pid_str, visual in LOBBY_VISUALS.items():
-                original_sprite = LOBBY_SPRITE_CACHE.get(pid_str) 
-                if original_sprite:
-                    rotated_sprite = pygame.transform.rotate(original_sprite, visual["angle"])
-                    original_rect = original_sprite.get_rect(topleft=(visual["x"], visual["y"]))
-                    new_rect = rotated_sprite.get_rect(center = original_rect.center)
-                    window.blit(rotated_sprite, new_rect)
+                # Draw bouncing players
+                for pid_str, x, y, angle in iter_lobby_visuals():
+                    original_sprite = LOBBY_SPRITE_CACHE.get(pid_str) 
+                    if original_sprite:
+                        rotated_sprite = get_rotated_sprite(pid_str, original_sprite, angle)
+                        original_rect = original_sprite.get_rect(topleft=(x, y))
+                        new_rect = rotated_sprite.get_rect(center = original_rect.center)
+                        window.blit(rotated_sprite, new_rect)
+                        sprite_rects.append(new_rect)
             
-        elif current_lobby_screen == "timer_select":
-            # --- MODIFIED: Draw a solid grey background instead of the playground ---
-            # pygame.draw.rect(window, (80, 80, 80), playground_rect) # <-- OLD
-            draw_playground_background() # <-- NEW: Reverted to standard tile
+            elif current_lobby_screen == "timer_select":
+                # --- MODIFIED: Draw a solid grey background instead of the playground ---
+                # pygame.draw.rect(window, (80, 80, 80), playground_rect) # <-- OLD
+                draw_playground_background() # <-- NEW: Reverted to standard tile
             
-        # --- 2. Draw Panel (ALWAYS) ---
-        pygame.draw.rect(window, PANEL_COLOR, panel_rect)
+            # --- 2. Draw Panel (ALWAYS) ---
+            pygame.draw.rect(window, PANEL_COLOR, panel_rect)
         
-        # Draw Title (Moved from being inside "main" screen logic)
-        if current_lobby_screen == "main":
-            TITLE_TEXT = "Coin Chaos"
-            SHADOW_COLOR = (0, 0, 0) # Black shadow
-            TITLE_COLOR = (255, 255, 255) # White text
-            SHADOW_OFFSET = 5
-            TITLE_POSITION = (WIDTH // 2, 150)
-
-            shadow_surface = pixel_title_font.render(TITLE_TEXT, True, SHADOW_COLOR)
-            shadow_rect = shadow_surface.get_rect(center=(TITLE_POSITION[0] + SHADOW_OFFSET, TITLE_POSITION[1] + SHADOW_OFFSET))
-            window.blit(shadow_surface, shadow_rect)
-            title_surface = pixel_title_font.render(TITLE_TEXT, True, TITLE_COLOR)
-            title_rect = title_surface.get_rect(center=TITLE_POSITION)
-            window.blit(title_surface, title_rect)
-
-        # Draw Tabs
-        lobby_color = TAB_COLOR_ACTIVE if active_panel_tab == "lobby" else TAB_COLOR_INACTIVE
-        chat_color = TAB_COLOR_ACTIVE if active_panel_tab == "chat" else TAB_COLOR_INACTIVE
-        pygame.draw.rect(window, lobby_color, lobby_tab_rect)
-        pygame.draw.rect(window, chat_color, chat_tab_rect)
-        lobby_text_surface = panel_tab_font.render("Lobby", True, TAB_TEXT_COLOR)
-        window.blit(lobby_text_surface, lobby_text_surface.get_rect(center=lobby_tab_rect.center))
-        chat_text_surface = panel_tab_font.render("Chat", True, TAB_TEXT_COLOR)
-        window.blit(chat_text_surface, chat_text_surface.get_rect(center=chat_tab_rect.center))
-        pygame.draw.line(window, TAB_LINE_COLOR, (WIDTH, 50), (WIDTH + SIDE_PANEL_WIDTH, 50), 2)
+            # Draw Title (Moved from being inside "main" screen logic)
+            if current_lobby_screen == "main":
+                window.blit(title_shadow_surface, title_shadow_rect)
+                window.blit(title_surface, title_rect)
+
+            # Draw Tabs
+            lobby_color = TAB_COLOR_ACTIVE if active_panel_tab == "lobby" else TAB_COLOR_INACTIVE
+            chat_color = TAB_COLOR_ACTIVE if active_panel_tab == "chat" else TAB_COLOR_INACTIVE
+            pygame.draw.rect(window, lobby_color, lobby_tab_rect)
+            pygame.draw.rect(window, chat_color, chat_tab_rect)
+            window.blit(lobby_tab_text, lobby_tab_text_rect)
+            window.blit(chat_tab_text, chat_tab_text_rect)
+            pygame.draw.line(window, TAB_LINE_COLOR, (WIDTH, 50), (WIDTH + SIDE_PANEL_WIDTH, 50), 2)
         
-        # Draw Tab Content
-        if active_panel_tab == "lobby":
-            title_y_offset = 70
-            active_title_surface = panel_tab_font.render("Active Player", True, TEXT_COLOR)
-            window.blit(active_title_surface, (WIDTH + 10, title_y_offset))
-            y_offset = title_y_offset + 50
-            for pid_str, player_data in players.items():
-                sprite = LOBBY_SPRITE_CACHE.get(pid_str) 
-                if sprite:
-                    small_sprite = pygame.transform.scale(sprite, (35, 45)) 
-                    window.blit(small_sprite, (WIDTH + 20, y_offset))
-                player_text_surface = panel_list_font.render(player_data['name'], True, tuple(player_data['color']))
-                window.blit(player_text_surface, (WIDTH + 70, y_offset + 10))
-                y_offset += 60
-        elif active_panel_tab == "chat":
-            # --- MODIFIED: Chat input is now part of the tab content area ---
-            draw_chat_ui(my_player_id, lobby_chat_input_rect.top - 10) # <-- USE LOBBY RECT
-            
-            # Draw the Input Box (at the bottom)
-            input_color = (255, 255, 255) if is_chatting else (100, 100, 100)
-            pygame.draw.rect(window, input_color, lobby_chat_input_rect, 2, border_radius=20) # <-- USE LOBBY RECT
+            # Draw Tab Content
+            if active_panel_tab == "lobby":
+                title_y_offset = 70
+                window.blit(active_title_surface, (WIDTH + 10, title_y_offset))
+                y_offset = title_y_offset + 50
+                for pid_str, player_data in players.items():
+                    small_sprite = AVATAR_SCALED.get(pid_str) # Pre-scaled 35x45 copy of the lobby sprite
+                    if small_sprite:
+                        window.blit(small_sprite, (WIDTH + 20, y_offset))
+                    player_text_surface = cached_render(panel_list_font, player_data['name'], player_data['color'])
+                    window.blit(player_text_surface, (WIDTH + 70, y_offset + 10))
+                    y_offset += 60
+            elif active_panel_tab == "chat":
+                # --- MODIFIED: Chat input is now part of the tab content area ---
+                draw_chat_ui(my_player_id, lobby_chat_input_rect.top - 10) # <-- USE LOBBY RECT
             
-            pygame.draw.circle(window, input_color, lobby_chat_send_rect.center, 20, 2) # <-- USE LOBBY RECT
-            if chat_send_img:
-                window.blit(chat_send_img, chat_send_img.get_rect(center=lobby_chat_send_rect.center)) # <-- USE LOBBY RECT
+                # Draw the Input Box (at the bottom)
+                input_color = (255, 255, 255) if is_chatting else (100, 100, 100)
+                pygame.draw.rect(window, input_color, lobby_chat_input_rect, 2, border_radius=20) # <-- USE LOBBY RECT
             
-            text_to_draw = current_chat_message
-            if is_chatting:
-                if int(time.time() * 2) % 2 == 0: text_to_draw += "|"
-            elif not current_chat_message:
-                text_to_draw = "Enter Here..."
-                input_color = (100, 100, 100) 
+                pygame.draw.circle(window, input_color, lobby_chat_send_rect.center, 20, 2) # <-- USE LOBBY RECT
+                if chat_send_img:
+                    window.blit(chat_send_img, chat_send_img.get_rect(center=lobby_chat_send_rect.center)) # <-- USE LOBBY RECT
             
-            text_surface = chat_input_font.render(text_to_draw, True, input_color)
-            text_rect = text_surface.get_rect(midleft=(lobby_chat_input_rect.left + 15, lobby_chat_input_rect.centery)) # <-- USE LOBBY RECT
+                text_surface = get_chat_input_surface(input_color)
+                text_rect = text_surface.get_rect(midleft=(lobby_chat_input_rect.left + 15, lobby_chat_input_rect.centery)) # <-- USE LOBBY RECT
             
-            clip_area = pygame.Rect(lobby_chat_input_rect.left + 15, lobby_chat_input_rect.top, lobby_chat_input_rect.width - 20, lobby_chat_input_rect.height) # <-- USE LOBBY RECT
-            original_clip = window.get_clip()
-            window.set_clip(clip_area)
-            window.blit(text_surface, text_rect)
-            window.set_clip(original_clip)
+                original_clip = window.get_clip()
+                window.set_clip(chat_input_clip_rect)
+                window.blit(text_surface, text_rect)
+                window.set_clip(original_clip)
             
-        # --- 3. Draw Foreground UI (Screen-specific) ---
-        if current_lobby_screen == "main":
-            # Draw Start/Wait button
-            if my_player_id == host_player_id:
-                if lobby_start_button_rect.collidepoint(mouse_pos) and not is_chatting:
-                    if mouse_pressed[0]: color = start_color_click
-                    else: color = start_color_hover
-                else: color = start_color_inactive
-                pygame.draw.rect(window, color, lobby_start_button_rect, border_radius=15)
-                window.blit(lobby_start_button_text, lobby_start_button_text.get_rect(center=lobby_start_button_rect.center))
-            else:
-                wait_text_surface = font.render(f"Waiting for host to start...", True, TEXT_COLOR)
-                wait_rect = wait_text_surface.get_rect(center=lobby_start_button_rect.center)
-                outline_surface = font.render(f"Waiting for host to start...", True, (0,0,0))
-                draw_text_outline(outline_surface, wait_rect.topleft)
-                window.blit(wait_text_surface, wait_rect)
+            # --- 3. Draw Foreground UI (Screen-specific) ---
+            if current_lobby_screen == "main":
+                # Draw Start/Wait button
+                if my_player_id == host_player_id:
+                    if hovered["start"] and not is_chatting:
+                        if mouse_pressed[0]: color = start_color_click
+                        else: color = start_color_hover
+                    else: color = start_color_inactive
+                    pygame.draw.rect(window, color, lobby_start_button_rect, border_radius=15)
+                    window.blit(lobby_start_button_text, lobby_start_button_text.get_rect(center=lobby_start_button_rect.center))
+                else:
+                    wait_text_surface = get_outlined_text("Waiting for host to start...", font, TEXT_COLOR)
+                    window.blit(wait_text_surface, wait_text_surface.get_rect(center=lobby_start_button_rect.center))
 
-            # Draw LEAVE Button
-            if leave_button_rect.collidepoint(mouse_pos) and not is_chatting:
-                color = leave_color_click if mouse_pressed[0] else leave_color_hover
-            else:
-                color = leave_color_inactive
-            pygame.draw.rect(window, color, leave_button_rect, border_radius=15)
-            window.blit(leave_text, leave_text.get_rect(center=leave_button_rect.center))
+                # Draw LEAVE Button
+                if hovered["leave"] and not is_chatting:
+                    color = leave_color_click if mouse_pressed[0] else leave_color_hover
+                else:
+                    color = leave_color_inactive
+                pygame.draw.rect(window, color, leave_button_rect, border_radius=15)
+                window.blit(leave_text, leave_text.get_rect(center=leave_button_rect.center))
 
-        elif current_lobby_screen == "timer_select":
-            # --- Draw Timer Select Screen ---
+            elif current_lobby_screen == "timer_select":
+                # --- Draw Timer Select Screen ---
             
-            # Draw Title
-            title_surface = pixel_title_font_small.render("Coin Chaos", True, TEXT_COLOR)
-            title_rect = title_surface.get_rect(center=(WIDTH // 2, 100))
-            shadow_surface = pixel_title_font_small.render("Coin Chaos", True, (0,0,0))
-            shadow_rect = shadow_surface.get_rect(center=(title_rect.centerx + 3, title_rect.centery + 3))
-            window.blit(shadow_surface, shadow_rect)
-            window.blit(title_surface, title_rect)
-
-            # Draw Subtitle
-            subtitle_surface = panel_title_font.render("Set Timer", True, TEXT_COLOR)
-            subtitle_rect = subtitle_surface.get_rect(center=(WIDTH // 2, 200))
-            window.blit(subtitle_surface, subtitle_rect)
-
-            # Draw Back Button
-            back_color = leave_color_inactive
-            if back_button_rect.collidepoint(mouse_pos):
-                back_color = leave_color_hover if not mouse_pressed[0] else leave_color_click
-            pygame.draw.circle(window, back_color, back_button_rect.center, 30)
-            pygame.draw.polygon(window, (255, 255, 255), [(back_button_rect.centerx + 10, back_button_rect.top + 15), 
-                                                          (back_button_rect.left + 15, back_button_rect.centery), 
-                                                          (back_button_rect.centerx + 10, back_button_rect.bottom - 15)])
+                # Draw Title
+                window.blit(timer_shadow_surface, timer_shadow_rect)
+                window.blit(timer_title_surface, timer_title_rect)
+
+                # Draw Subtitle
+                window.blit(subtitle_surface, subtitle_rect)
+
+                # Draw Back Button
+                back_color = leave_color_inactive
+                if hovered["back"]:
+                    back_color = leave_color_hover if not mouse_pressed[0] else leave_color_click
+                pygame.draw.circle(window, back_color, back_button_rect.center, 30)
+                pygame.draw.polygon(window, (255, 255, 255), back_arrow_points)
             
-            # Draw Timer Boxes
-            pygame.draw.rect(window, (50, 50, 50), min_box_rect, border_radius=15)
-            pygame.draw.rect(window, (50, 50, 50), sec_box_rect, border_radius=15)
+                # Draw Timer Boxes
+                pygame.draw.rect(window, (50, 50, 50), min_box_rect, border_radius=15)
+                pygame.draw.rect(window, (50, 50, 50), sec_box_rect, border_radius=15)
             
-            min_text = timer_number_font.render(f"{selected_minutes:02d}", True, TEXT_COLOR)
-            sec_text = timer_number_font.render("00", True, (100, 100, 100)) # Disabled seconds
-            window.blit(min_text, min_text.get_rect(center=min_box_rect.center))
-            window.blit(sec_text, sec_text.get_rect(center=sec_box_rect.center))
+                min_text = cached_render(timer_number_font, f"{selected_minutes:02d}", TEXT_COLOR)
+                window.blit(min_text, min_text.get_rect(center=min_box_rect.center))
+                window.blit(sec_text, sec_text_rect)
             
-            # Draw Colon
-            colon_text = timer_number_font.render(":", True, TEXT_COLOR)
-            window.blit(colon_text, colon_text.get_rect(center=(WIDTH // 2, min_box_rect.centery)))
-
-            # Draw Minute Arrows
-            min_up_color = ARROW_COLOR_INACTIVE
-            if min_up_rect.collidepoint(mouse_pos):
-                min_up_color = ARROW_COLOR_HOVER if not mouse_pressed[0] else ARROW_COLOR_CLICK
-            pygame.draw.polygon(window, min_up_color, [(min_up_rect.centerx, min_up_rect.top), 
-                                                     (min_up_rect.left + 20, min_up_rect.bottom), 
-                                                     (min_up_rect.right - 20, min_up_rect.bottom)])
+                # Draw Colon
+                window.blit(colon_text, colon_text_rect)
+
+                # Draw Minute Arrows
+                min_up_color = ARROW_COLOR_INACTIVE
+                if hovered["min_up"]:
+                    min_up_color = ARROW_COLOR_HOVER if not mouse_pressed[0] else ARROW_COLOR_CLICK
+                pygame.draw.polygon(window, min_up_color, min_up_points)
             
-            min_down_color = ARROW_COLOR_INACTIVE
-            if min_down_rect.collidepoint(mouse_pos):
-                min_down_color = ARROW_COLOR_HOVER if not mouse_pressed[0] else ARROW_COLOR_CLICK
-            pygame.draw.polygon(window, min_down_color, [(min_down_rect.centerx, min_down_rect.bottom), 
-                                                         (min_down_rect.left + 20, min_down_rect.top), 
-                                                         (min_down_rect.right - 20, min_down_rect.top)])
-
-            # Draw Disabled Second Arrows
-            pygame.draw.polygon(window, ARROW_COLOR_DISABLED, [(sec_up_rect.centerx, sec_up_rect.top), 
-                                                             (sec_up_rect.left + 20, sec_up_rect.bottom), 
-                                                             (sec_up_rect.right - 20, sec_up_rect.bottom)])
-            pygame.draw.polygon(window, ARROW_COLOR_DISABLED, [(sec_down_rect.centerx, sec_down_rect.bottom), 
-                                                             (sec_down_rect.left + 20, sec_down_rect.top), 
-                                                             (sec_down_rect.right - 20, sec_down_rect.top)])
+                min_down_color = ARROW_COLOR_INACTIVE
+                if hovered["min_down"]:
+                    min_down_color = ARROW_COLOR_HOVER if not mouse_pressed[0] else ARROW_COLOR_CLICK
+                pygame.draw.polygon(window, min_down_color, min_down_points)
+
+                # Draw Disabled Second Arrows
+                pygame.draw.polygon(window, ARROW_COLOR_DISABLED, sec_up_points)
+                pygame.draw.polygon(window, ARROW_COLOR_DISABLED, sec_down_points)
             
-            # Draw Timer Start Button
-            start_color = start_color_inactive
-            if timer_start_button_rect.collidepoint(mouse_pos):
-                start_color = start_color_hover if not mouse_pressed[0] else start_color_click
-            pygame.draw.rect(window, start_color, timer_start_button_rect, border_radius=15)
-            window.blit(timer_start_button_text, timer_start_button_text.get_rect(center=timer_start_button_rect.center))
+                # Draw Timer Start Button
+                start_color = start_color_inactive
+                if hovered["timer_start"]:
+                    start_color = start_color_hover if not mouse_pressed[0] else start_color_click
+                pygame.draw.rect(window, start_color, timer_start_button_rect, border_radius=15)
+                window.blit(timer_start_button_text, timer_start_button_text.get_rect(center=timer_start_button_rect.center))
 
 
-        pygame.display.flip()
-        await asyncio.sleep(0.01)
+            if full_redraw or current_lobby_screen != "main":
+                pygame.display.flip()
+            else:
+                pygame.display.update(prev_sprite_rects + sprite_rects + main_ui_rects + [panel_rect])
+            prev_sprite_rects = sprite_rects
+            full_redraw = current_lobby_screen != "main"
+            needs_redraw = False
 
-    return None # Return None if loop exits normally (e.g. leave button)
+        return None # Return None if loop exits normally (e.g. leave button)
+    finally:
+        recv_task.cancel()
 
 
 # --- MODIFIED: game_loop (individual facing, IDLE frame only) ---
@@ -988,9 +1501,12 @@ async def game_loop(websocket, my_player_id, initial_data):
     
     # --- NEW: Initialize state from the data packet ---
     players = initial_data.get("players", {})
+    ingest_player_colors(players)
     resources = initial_data.get("resources", [])
     game_end_time = initial_data.get("game_end_time", 0)
-    game_start_time = initial_data.get("game_start_time", time.time()) 
+    # Server times are wall-clock; convert once so the per-frame countdowns run on time.monotonic()
+    game_end_deadline = to_monotonic(game_end_time) if game_end_time > 0 else 0
+    game_start_time = to_monotonic(initial_data.get("game_start_time", time.time()))
     
     my_score = 0
     if str(my_player_id) in players:
@@ -1022,450 +1538,483 @@ async def game_loop(websocket, my_player_id, initial_data):
     
     local_player_facing_direction = "right" 
     local_is_moving = False 
+    pending_dx, pending_dy = 0, 0 # Movement not yet sent to the server
+    last_move_send = 0.0
     
     player_visual_state = {} 
     prev_players_state = {}  
+    # Leaderboard order, re-sorted only when an update changes the (pid, score) pairs
+    score_signature = tuple((pid, p["score"]) for pid, p in players.items())
+    sorted_players = heapq.nlargest(LEADERBOARD_ROWS, players.items(), key=lambda p: p[1]["score"])
     
     update_game_sprite_cache(players)
     for pid, pdata in players.items():
         player_visual_state[pid] = {"facing": "right"}
         prev_players_state[pid] = {"x": pdata["x"], "y": pdata["y"]}
-
-    while running:
-        mouse_pos = pygame.mouse.get_pos()
-        mouse_pressed = pygame.mouse.get_pressed()
+    coin_sprite = get_coin_sprite()
+
+    # --- Static labels (rendered once instead of every frame) ---
+    lobby_tab_text = panel_tab_font.render("Lobby", True, TAB_TEXT_COLOR)
+    lobby_tab_text_rect = lobby_tab_text.get_rect(center=lobby_tab_rect.center)
+    chat_tab_text = panel_tab_font.render("Chat", True, TAB_TEXT_COLOR)
+    chat_tab_text_rect = chat_tab_text.get_rect(center=chat_tab_rect.center)
+    active_title_surface = panel_tab_font.render("Leaderboard", True, TEXT_COLOR)
+    timer_title_surface = panel_tab_font.render("Time Left", True, TEXT_COLOR)
+    # --- MODIFIED: Moved title up ---
+    timer_title_rect = timer_title_surface.get_rect(center=(WIDTH + SIDE_PANEL_WIDTH // 2, (HEIGHT - 190) + 30)) # Was + 35 (below the divider)
+    chat_history_area_rect = pygame.Rect(WIDTH, 60, SIDE_PANEL_WIDTH, (HEIGHT - 230) - 60) # From tabs to input box
+
+    # Local aliases for the calls made every frame (LOAD_FAST instead of global + attribute lookups)
+    blit = window.blit
+    blits = window.blits
+    draw_rect = pygame.draw.rect
+    draw_circle = pygame.draw.circle
+    get_mouse_pos = pygame.mouse.get_pos
+    get_mouse_pressed = pygame.mouse.get_pressed
+    get_keys_pressed = pygame.key.get_pressed
+    time_now = time.monotonic
+
+    # Network reads happen in a background task so the frame loop never blocks on recv()
+    recv_task = asyncio.create_task(_recv_loop(websocket, server_inbox))
+    next_frame_time = time_now()
+    shown_timer_second = -1 # Second currently rendered in the "Time Left" box
+    needs_redraw = True # Set when something on screen changed; idle frames skip drawing and flip
+    last_blink_phase = None
+    shown_countdown = None
+    try:
+        while running:
+            # Sleep (not clock.tick) until this frame is due, so the receive task keeps reading meanwhile
+            frame_delay = next_frame_time - time_now()
+            if frame_delay < 0: # Fell behind (slow frame); don't try to catch up with a burst of frames
+                next_frame_time -= frame_delay
+                frame_delay = 0
+            await asyncio.sleep(frame_delay)
+            next_frame_time += FRAME_INTERVAL
+
+            mouse_pos = get_mouse_pos()
+            mouse_pressed = get_mouse_pressed()
+            if collect_lobby_sprites(): needs_redraw = True
         
-        # --- 1. Check events ---
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT: running = False; return None
+            # --- 1. Check events ---
+            for event in pygame.event.get():
+                # One type dispatch per event; the branches below are mutually exclusive
+                event_type = event.type
+                needs_redraw = True # Clicks, keys and mouse motion (hover) can all change the screen
+                if event_type == pygame.QUIT: running = False; return None
             
-            # --- NEW: Chat Input Handling ---
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_RETURN:
-                    if is_chatting:
-                        # Send message
-                        if current_chat_message:
-                            try:
-                                await websocket.send(json.dumps({"type": "chat", "message": current_chat_message}))
+                # --- NEW: Chat Input Handling ---
+                elif event_type == pygame.KEYDOWN:
+                    if event.key == pygame.K_RETURN:
+                        if is_chatting:
+                            # Send message
+                            if current_chat_message:
+                                try:
+                                    await websocket.send(json_dumps({"type": "chat", "message": current_chat_message}))
                                 
-                                # --- NEW: Local Echo ---
-                                my_player_data = players.get(str(my_player_id), {})
-                                chat_history.append({
-                                    "type": "chat",
-                                    "sender_id": str(my_player_id),
-                                    "name": my_player_data.get("name", "Me"),
-                                    "color": my_player_data.get("color", TEXT_COLOR),
-                                    "msg": current_chat_message,
-                                    "timestamp": get_chat_timestamp()
-                                })
-                                if len(chat_history) > CHAT_HISTORY_MAX:
-                                    chat_history.pop(0)
-                                chat_message_sound.play() # <-- NEW: Play sound on local echo
-                                # --- END NEW ---
+                                    # --- NEW: Local Echo ---
+                                    my_player_data = players.get(str(my_player_id), {})
+                                    chat_history.append({
+                                        "type": "chat",
+                                        "sender_id": str(my_player_id),
+                                        "name": my_player_data.get("name", "Me"),
+                                        "color": my_player_data.get("color", TEXT_COLOR),
+                                        "msg": current_chat_message,
+                                        "timestamp": get_chat_timestamp()
+                                    })
+                                    chat_message_sound.play() # <-- NEW: Play sound on local echo
+                                    # --- END NEW ---
                                 
-                            except websockets.exceptions.ConnectionClosed:
-                                print("Failed to send chat."); running = False; return None
-                        current_chat_message = ""
-                        is_chatting = False
-                    else:
-                        # Activate chat (if chat tab is active)
-                        if active_panel_tab == "chat":
-                            is_chatting = True
-                elif is_chatting:
-                    if event.key == pygame.K_BACKSPACE:
-                        current_chat_message = current_chat_message[:-1]
-                    elif event.unicode.isprintable(): # Only add printable chars
-                         if chat_input_font.size(current_chat_message + event.unicode)[0] < chat_input_rect.width - 20:
-                            current_chat_message += event.unicode
-            # --- END NEW ---
+                                except websockets.exceptions.ConnectionClosed:
+                                    print("Failed to send chat."); running = False; return None
+                            clear_chat_input()
+                            is_chatting = False
+                        else:
+                            # Activate chat (if chat tab is active)
+                            if active_panel_tab == "chat":
+                                is_chatting = True
+                    elif is_chatting:
+                        if event.key == pygame.K_BACKSPACE:
+                            erase_chat_char()
+                        elif event.unicode.isprintable(): # Only add printable chars
+                            type_chat_char(event.unicode, chat_input_rect.width - 20)
+                # --- END NEW ---
             
-            # --- NEW: Scroll Wheel Handling (Game) ---
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                # --- MODIFIED: Define the chat history area for new layout ---
-                chat_history_area_rect = pygame.Rect(WIDTH, 60, SIDE_PANEL_WIDTH, (HEIGHT - 230) - 60) # From tabs to input box
+                elif event_type == pygame.MOUSEBUTTONDOWN:
+                    # --- NEW: Scroll Wheel Handling (Game) ---
+                    if active_panel_tab == 'chat' and chat_history_area_rect.collidepoint(event.pos):
+                        if event.button == 4: # Scroll Up
+                            chat_scroll_offset = max(0, chat_scroll_offset - 1)
+                            continue # This click was for scrolling
+                        elif event.button == 5: # Scroll Down
+                            chat_scroll_offset += 1
+                            continue # This click was for scrolling
+                        # --- BUG FIX: Removed 'continue' from here. ---
+                        # A left-click (button 1) should now fall through.
+
+                    # --- ENTIRE MOUSEBUTTONDOWN HANDLER RE-ORDERED ---
                 
-                if active_panel_tab == 'chat' and chat_history_area_rect.collidepoint(event.pos):
-                    if event.button == 4: # Scroll Up
-                        chat_scroll_offset = max(0, chat_scroll_offset - 1)
-                        continue # This click was for scrolling
-                    elif event.button == 5: # Scroll Down
-                        chat_scroll_offset += 1
-                        continue # This click was for scrolling
-                    # --- BUG FIX: Removed 'continue' from here. ---
-                    # A left-click (button 1) should now fall through.
-
-            # --- ENTIRE MOUSEBUTTONDOWN HANDLER RE-ORDERED ---
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                
-                # --- 1. Handle Tab Clicks FIRST ---
-                # These should work regardless of chat state.
-                if lobby_tab_rect.collidepoint(event.pos):
-                    active_panel_tab = "lobby"
-                    is_chatting = False # Deactivate chat when switching tabs
-                    click_sound.play()
-                    continue # Done with this click
-                if chat_tab_rect.collidepoint(event.pos):
-                    active_panel_tab = "chat"
-                    is_chatting = True # Auto-focus chat
-                    click_sound.play()
-                    continue # Done with this click
-
-                # --- 2. Handle Chat-Related Clicks ---
-                if is_chatting:
-                    # Check for send button click
-                    if chat_send_rect.collidepoint(event.pos):
-                        if current_chat_message:
-                            try:
-                                await websocket.send(json.dumps({"type": "chat", "message": current_chat_message}))
-                                
-                                # --- NEW: Local Echo ---
-                                my_player_data = players.get(str(my_player_id), {})
-                                chat_history.append({
-                                    "type": "chat",
-                                    "sender_id": str(my_player_id),
-                                    "name": my_player_data.get("name", "Me"),
-                                    "color": my_player_data.get("color", TEXT_COLOR),
-                                    "msg": current_chat_message,
-                                    "timestamp": get_chat_timestamp()
-                                })
-                                if len(chat_history) > CHAT_HISTORY_MAX:
-                                    chat_history.pop(0)
-                                chat_message_sound.play() # <-- NEW: Play sound on local echo
-                                # --- END NEW ---
-                                
-                            except websockets.exceptions.ConnectionClosed:
-                                print("Failed to send chat."); running = False; return None
-                        current_chat_message = ""
-                        # Don't deactivate chat, just clear message
+                    # --- 1. Handle Tab Clicks FIRST ---
+                    # These should work regardless of chat state.
+                    if lobby_tab_rect.collidepoint(event.pos):
+                        active_panel_tab = "lobby"
+                        is_chatting = False # Deactivate chat when switching tabs
+                        click_sound.play()
                         continue # Done with this click
-                    
-                    # Check if click is on the input box
-                    if chat_input_rect.collidepoint(event.pos):
-                        # User is just focusing the input box, do nothing
+                    if chat_tab_rect.collidepoint(event.pos):
+                        active_panel_tab = "chat"
+                        is_chatting = True # Auto-focus chat
+                        click_sound.play()
                         continue # Done with this click
 
-                    # --- 3. Clicked *outside* chat UI ---
-                    # Deactivate chat and let the click be processed
-                    # by other buttons (like "Leave" or "Start")
-                    is_chatting = False
-                    # --- DO NOT CONTINUE HERE ---
-                    # Let the click fall through to the buttons below
+                    # --- 2. Handle Chat-Related Clicks ---
+                    if is_chatting:
+                        # Check for send button click
+                        if chat_send_rect.collidepoint(event.pos):
+                            if current_chat_message:
+                                try:
+                                    await websocket.send(json_dumps({"type": "chat", "message": current_chat_message}))
+                                
+                                    # --- NEW: Local Echo ---
+                                    my_player_data = players.get(str(my_player_id), {})
+                                    chat_history.append({
+                                        "type": "chat",
+                                        "sender_id": str(my_player_id),
+                                        "name": my_player_data.get("name", "Me"),
+                                        "color": my_player_data.get("color", TEXT_COLOR),
+                                        "msg": current_chat_message,
+                                        "timestamp": get_chat_timestamp()
+                                    })
+                                    chat_message_sound.play() # <-- NEW: Play sound on local echo
+                                    # --- END NEW ---
+                                
+                                except websockets.exceptions.ConnectionClosed:
+                                    print("Failed to send chat."); running = False; return None
+                            clear_chat_input()
+                            # Don't deactivate chat, just clear message
+                            continue # Done with this click
+                    
+                        # Check if click is on the input box
+                        if chat_input_rect.collidepoint(event.pos):
+                            # User is just focusing the input box, do nothing
+                            continue # Done with this click
+
+                        # --- 3. Clicked *outside* chat UI ---
+                        # Deactivate chat and let the click be processed
+                        # by other buttons (like "Leave" or "Start")
+                        is_chatting = False
+                        # --- DO NOT CONTINUE HERE ---
+                        # Let the click fall through to the buttons below
 
-                # --- 4. Handle Other Buttons (Leave, Start, etc.) ---
-                if leave_button_rect.collidepoint(event.pos):
-                    click_sound.play(); running = False; return None
-            # --- END OF RE-ORDERED MOUSEBUTTONDOWN HANDLER ---
+                    # --- 4. Handle Other Buttons (Leave, Start, etc.) ---
+                    if leave_button_rect.collidepoint(event.pos):
+                        click_sound.play(); running = False; return None
+                # --- END OF RE-ORDERED MOUSEBUTTONDOWN HANDLER ---
 
 
-        time_to_start = game_start_time - time.time()
-        game_has_started = time_to_start <= 0
+            time_to_start = game_start_time - time_now()
+            game_has_started = time_to_start <= 0
 
-        # --- 2. MODIFIED: Handle player input (updates LOCAL variables) ---
-        local_is_moving = False # Assume not moving
+            # --- 2. MODIFIED: Handle player input (updates LOCAL variables) ---
+            local_is_moving = False # Assume not moving
         
-        # --- MODIFIED: Only allow movement if game has started AND not chatting ---
-        if game_has_started and not is_chatting:
-            keys = pygame.key.get_pressed()
-            dx, dy = 0, 0
+            # --- MODIFIED: Only allow movement if game has started AND not chatting ---
+            if game_has_started and not is_chatting:
+                keys = get_keys_pressed()
+                dx, dy = 0, 0
             
-            if keys[pygame.K_LEFT] or keys[pygame.K_a]: # <-- ADDED
-                dx = -PLAYER_SPEED
-                local_player_facing_direction = "right" # Your custom direction
-                local_is_moving = True
-            if keys[pygame.K_RIGHT] or keys[pygame.K_d]: # <-- ADDED
-                dx = PLAYER_SPEED
-                local_player_facing_direction = "left" # Your custom direction
-                local_is_moving = True
-            if keys[pygame.K_UP] or keys[pygame.K_w]: # <-- ADDED
-                dy = -PLAYER_SPEED
-                local_is_moving = True
-            if keys[pygame.K_DOWN] or keys[pygame.K_s]: # <-- ADDED
-                dy = PLAYER_SPEED
-                local_is_moving = True
+                if keys[pygame.K_LEFT] or keys[pygame.K_a]: # <-- ADDED
+                    dx = -PLAYER_SPEED
+                    local_player_facing_direction = "right" # Your custom direction
+                    local_is_moving = True
+                if keys[pygame.K_RIGHT] or keys[pygame.K_d]: # <-- ADDED
+                    dx = PLAYER_SPEED
+                    local_player_facing_direction = "left" # Your custom direction
+                    local_is_moving = True
+                if keys[pygame.K_UP] or keys[pygame.K_w]: # <-- ADDED
+                    dy = -PLAYER_SPEED
+                    local_is_moving = True
+                if keys[pygame.K_DOWN] or keys[pygame.K_s]: # <-- ADDED
+                    dy = PLAYER_SPEED
+                    local_is_moving = True
                 
-            if dx != 0 or dy != 0:
-                try:
-                    await websocket.send(json.dumps({"type": "move", "dx": dx, "dy": dy}))
-                except websockets.exceptions.ConnectionClosed:
-                    running = False; return None 
+                pending_dx += dx
+                pending_dy += dy
+
+            # Coalesce movement into one packet per MOVE_SEND_INTERVAL instead of one per frame
+            if pending_dx or pending_dy:
+                now = time_now()
+                if now - last_move_send >= MOVE_SEND_INTERVAL:
+                    try:
+                        await websocket.send(MOVE_MESSAGE.format(pending_dx, pending_dy))
+                    except websockets.exceptions.ConnectionClosed:
+                        running = False; return None 
+                    pending_dx, pending_dy = 0, 0
+                    last_move_send = now
         
-        # --- 3. Receive updates ---
-        try:
-            response = await asyncio.wait_for(websocket.recv(), timeout=WEBSOCKET_SEND_TIMEOUT)
-            data = json.loads(response)
-
-            # --- NEW: Handle NEW Chat Broadcast ---
-            if data.get("type") == "chat_broadcast":
-                chat_history.append({
-                    "type": "chat",
-                    "sender_id": data.get("sender_id"),
-                    "name": data.get("sender_name", "System"),
-                    "color": data.get("sender_color", (200, 200, 200)),
-                    "msg": data.get("message", ""),
-                    "timestamp": data.get("timestamp", "")
-                })
-                if len(chat_history) > CHAT_HISTORY_MAX:
-                    chat_history.pop(0)
-                if not is_chatting:
-                    chat_message_sound.play()
-                continue
-            # --- NEW: Handle System Message ---
-            elif data.get("type") == "system_message":
-                chat_history.append({
-                    "type": "system",
-                    "msg": data.get("message", ""),
-                    "timestamp": data.get("timestamp", "")
-                })
-                if len(chat_history) > CHAT_HISTORY_MAX:
-                    chat_history.pop(0)
-                #chat_message_sound.play()
-                continue
-            # --- END NEW ---
-
-            players = data.get("players", {})
-            resources = data.get("resources", [])
-            game_end_time = data.get("game_end_time", 0)
+            # --- 3. Receive updates ---
+            # --- Drain everything the receive task has queued since last frame ---
+            while server_inbox:
+                data = server_inbox.popleft()
+                needs_redraw = True
+
+                # --- NEW: Handle NEW Chat Broadcast ---
+                if data.get("type") == "chat_broadcast":
+                    chat_history.append({
+                        "type": "chat",
+                        "sender_id": data.get("sender_id"),
+                        "name": data.get("sender_name", "System"),
+                        "color": tuple(data.get("sender_color", (200, 200, 200))),
+                        "msg": data.get("message", ""),
+                        "timestamp": data.get("timestamp", "")
+                    })
+                    if not is_chatting:
+                        chat_message_sound.play()
+                    continue
+                # --- NEW: Handle System Message ---
+                elif data.get("type") == "system_message":
+                    chat_history.append({
+                        "type": "system",
+                        "msg": data.get("message", ""),
+                        "timestamp": data.get("timestamp", "")
+                    })
+                    #chat_message_sound.play()
+                    continue
+                # --- END NEW ---
+                # --- Delta: only the players and coins that changed since the last update ---
+                elif data.get("type") == "delta":
+                    for player_id_str, changes in data["moved"].items():
+                        player_data = players.get(player_id_str)
+                        if player_data is not None:
+                            player_data.update(changes)
+                    if data["coins_removed"]:
+                        removed_coins = set(data["coins_removed"])
+                        resources = [r for r in resources if r["id"] not in removed_coins]
+                    resources.extend(data["coins_added"])
+                else:
+                    players = data.get("players", {})
+                    ingest_player_colors(players)
+                    resources = data.get("resources", [])
+                    new_end_time = data.get("game_end_time", 0)
+                    if new_end_time != game_end_time:
+                        game_end_time = new_end_time
+                        game_end_deadline = to_monotonic(game_end_time) if game_end_time > 0 else 0
+                new_signature = tuple((pid, p["score"]) for pid, p in players.items())
+                if new_signature != score_signature:
+                    sorted_players = heapq.nlargest(LEADERBOARD_ROWS, players.items(), key=lambda p: p[1]["score"])
+                    score_signature = new_signature
             
-            update_game_sprite_cache(players)
-            update_lobby_sprite_cache(players) # <-- ADDED THIS LINE
-            new_player_count = len(players)
-            if new_player_count > KNOWN_PLAYER_COUNT: connect_sound.play()
-            elif new_player_count < KNOWN_PLAYER_COUNT: disconnect_sound.play()
-            KNOWN_PLAYER_COUNT = new_player_count
+                update_game_sprite_cache(players)
+                update_lobby_sprite_cache(players) # <-- ADDED THIS LINE
+                new_player_count = len(players)
+                if new_player_count > KNOWN_PLAYER_COUNT: connect_sound.play()
+                elif new_player_count < KNOWN_PLAYER_COUNT: disconnect_sound.play()
+                KNOWN_PLAYER_COUNT = new_player_count
             
-            player_data = players.get(str(my_player_id), {})
-            new_score = player_data.get("score", 0)
-            if new_score > my_score: coin_sound.play()
-            my_score = new_score
+                player_data = players.get(str(my_player_id), {})
+                new_score = player_data.get("score", 0)
+                if new_score > my_score: coin_sound.play()
+                my_score = new_score
             
-            # --- NEW: Update visual state for ALL players ---
-            for player_id_str, player_data in players.items():
-                if player_id_str not in player_visual_state:
-                    # Player just joined
-                    player_visual_state[player_id_str] = {"facing": "right"}
-                    prev_players_state[player_id_str] = {"x": player_data["x"], "y": player_data["y"]}
+                # --- NEW: Update visual state for ALL players ---
+                for player_id_str, player_data in players.items():
+                    if player_id_str not in player_visual_state:
+                        # Player just joined
+                        player_visual_state[player_id_str] = {"facing": "right"}
+                        prev_players_state[player_id_str] = {"x": player_data["x"], "y": player_data["y"]}
                 
-                current_visuals = player_visual_state[player_id_str]
-                prev_state = prev_players_state[player_id_str]
+                    current_visuals = player_visual_state[player_id_str]
+                    prev_state = prev_players_state[player_id_str]
 
-                new_facing = current_visuals["facing"] 
+                    new_facing = current_visuals["facing"] 
                 
-                if int(player_id_str) == my_player_id:
-                    # --- MODIFIED: Only update facing if NOT chatting ---
-                    if not is_chatting:
-                        new_facing = local_player_facing_direction
-                else:
-                    dx = player_data["x"] - prev_state["x"]
+                    if int(player_id_str) == my_player_id:
+                        # --- MODIFIED: Only update facing if NOT chatting ---
+                        if not is_chatting:
+                            new_facing = local_player_facing_direction
+                    else:
+                        dx = player_data["x"] - prev_state["x"]
                     
-                    if dx > 0:
-                        new_facing = "left" # Your "right" sprite
-                    elif dx < 0:
-                        new_facing = "right" # Your "left" sprite
+                        if dx > 0:
+                            new_facing = "left" # Your "right" sprite
+                        elif dx < 0:
+                            new_facing = "right" # Your "left" sprite
                 
-                player_visual_state[player_id_str] = {"facing": new_facing}
-            
-            for player_id_str, player_data in players.items():
-                prev_players_state[player_id_str] = {"x": player_data["x"], "y": player_data["y"]}
-
-            if data.get("game_state") == "leaderboard":
-                game_over_sound.play() # <-- NEW: Play sound
-                running = False; break 
-        except asyncio.TimeoutError:
-            pass 
-        except (websockets.exceptions.ConnectionClosed, json.JSONDecodeError) as e:
-            print(f"Connection error in game: {e}"); running = False; return None 
-
-        
+                    current_visuals["facing"] = new_facing
+                    prev_state["x"] = player_data["x"]; prev_state["y"] = player_data["y"]
+
+                if data.get("game_state") == "leaderboard":
+                    game_over_sound.play() # <-- NEW: Play sound
+                    running = False; break 
+            if not running: break
+            if recv_task.done() and not server_inbox:
+                print("Connection error in game."); return None 
+
+            # --- 4. Skip the frame if nothing visible changed ---
+            # Besides events and updates, only the cursor blink, the countdown and the timer change on their own
+            blink_phase = int(time_now() * 2) if is_chatting and active_panel_tab == "chat" else None
+            if blink_phase != last_blink_phase:
+                last_blink_phase = blink_phase; needs_redraw = True
+            countdown_num = None if game_has_started else int(time_to_start) + 1
+            if countdown_num != shown_countdown:
+                shown_countdown = countdown_num; needs_redraw = True
+            if game_end_time > 0 and int(max(0, game_end_deadline - time_now())) != shown_timer_second:
+                needs_redraw = True
+            if not needs_redraw:
+                continue
+            needs_redraw = False
             
-        # --- 5. Draw the UI ---
-        draw_playground_background()
-        pygame.draw.rect(window, PANEL_COLOR, panel_rect)
+            # --- 5. Draw the UI ---
+            draw_playground_background()
+            draw_rect(window, PANEL_COLOR, panel_rect)
 
-        # --- 6. MODIFIED: Draw players (IDLE frame only) ---
-        for player_id_str, player in players.items():
-            visuals = player_visual_state.get(player_id_str, {"facing": "right"})
-            current_facing = visuals['facing']
-            animation_frame_index = 0
+            # --- 6. MODIFIED: Draw players (IDLE frame only) ---
+            for player_id_str, player in players.items():
+                visuals = player_visual_state.get(player_id_str, {"facing": "right"})
+                current_facing = visuals['facing']
+                animation_frame_index = 0
             
-            sprite_list = None
-            if current_facing == "left":
-                sprite_list = GAME_SPRITE_CACHE_L.get(player_id_str)
-            else:
-                sprite_list = GAME_SPRITE_CACHE_R.get(player_id_str)
+                sprite_list = None
+                if current_facing == "left":
+                    sprite_list = GAME_SPRITE_CACHE_L.get(player_id_str)
+                else:
+                    sprite_list = GAME_SPRITE_CACHE_R.get(player_id_str)
             
-            if sprite_list:
-                sprite = sprite_list[animation_frame_index]
-                if sprite:
-                    sprite_rect = sprite.get_rect(center=(player["x"], player["y"]))
-                    window.blit(sprite, sprite_rect)
+                if sprite_list:
+                    sprite = sprite_list[animation_frame_index]
+                    if sprite:
+                        sprite_rect = sprite.get_rect(center=(player["x"], player["y"]))
+                        blit(sprite, sprite_rect)
+                    else:
+                        draw_circle(window, player["color"], (player["x"], player["y"]), PLAYER_SIZE // 2)
                 else:
-                    pygame.draw.circle(window, tuple(player["color"]), (player["x"], player["y"]), PLAYER_SIZE // 2)
-            else:
-                pygame.draw.circle(window, tuple(player["color"]), (player["x"], player["y"]), PLAYER_SIZE // 2)
+                    draw_circle(window, player["color"], (player["x"], player["y"]), PLAYER_SIZE // 2)
 
-            text_content = f"{player['name']}: {player['score']}"
-            text_surface = font.render(text_content, True, TEXT_COLOR)
-            text_rect = text_surface.get_rect(center=(player["x"], player["y"] - PLAYER_SIZE // 2 - 25))
-            
-            outline_surface = font.render(text_content, True, (0,0,0))
-            # Use a simpler outline for in-game text
-            for dx in [-1, 1]:
-                for dy in [-1, 1]:
-                    window.blit(outline_surface, (text_rect.x + dx, text_rect.y + dy))
-            
-            window.blit(text_surface, text_rect)
+                # Name tag with its simpler (4 diagonal copies) outline baked in; one blit per player
+                label_surface = get_label_text(f"{player['name']}: {player['score']}", font, TEXT_COLOR)
+                blit(label_surface, label_surface.get_rect(center=(player["x"], player["y"] - PLAYER_SIZE // 2 - 25)))
         
-        for resource in resources:
-            window.blit(coin_sprite, (resource["x"] - RESOURCE_SIZE // 2, resource["y"] - RESOURCE_SIZE // 2))
+            coin_half = RESOURCE_SIZE // 2
+            blits([(coin_sprite, (resource["x"] - coin_half, resource["y"] - coin_half)) for resource in resources], False)
 
-        # --- NEW: Tab Drawing and Content Switching ---
-        
-        # 1. Draw the Tabs
-        lobby_color = TAB_COLOR_ACTIVE if active_panel_tab == "lobby" else TAB_COLOR_INACTIVE
-        chat_color = TAB_COLOR_ACTIVE if active_panel_tab == "chat" else TAB_COLOR_INACTIVE
+            # --- NEW: Tab Drawing and Content Switching ---
         
-        pygame.draw.rect(window, lobby_color, lobby_tab_rect)
-        pygame.draw.rect(window, chat_color, chat_tab_rect)
+            # 1. Draw the Tabs
+            lobby_color = TAB_COLOR_ACTIVE if active_panel_tab == "lobby" else TAB_COLOR_INACTIVE
+            chat_color = TAB_COLOR_ACTIVE if active_panel_tab == "chat" else TAB_COLOR_INACTIVE
         
-        lobby_text_surface = panel_tab_font.render("Lobby", True, TAB_TEXT_COLOR)
-        lobby_text_rect = lobby_text_surface.get_rect(center=lobby_tab_rect.center)
-        window.blit(lobby_text_surface, lobby_text_rect)
+            draw_rect(window, lobby_color, lobby_tab_rect)
+            draw_rect(window, chat_color, chat_tab_rect)
         
-        chat_text_surface = panel_tab_font.render("Chat", True, TAB_TEXT_COLOR)
-        chat_text_rect = chat_text_surface.get_rect(center=chat_tab_rect.center)
-        window.blit(chat_text_surface, chat_text_rect)
+            blit(lobby_tab_text, lobby_tab_text_rect)
+            blit(chat_tab_text, chat_tab_text_rect)
 
-        # Draw the dividing line
-        pygame.draw.line(window, TAB_LINE_COLOR, (WIDTH, 50), (WIDTH + SIDE_PANEL_WIDTH, 50), 2)
+            # Draw the dividing line
+            pygame.draw.line(window, TAB_LINE_COLOR, (WIDTH, 50), (WIDTH + SIDE_PANEL_WIDTH, 50), 2)
         
-        # 2. Draw Content Based on Active Tab
-        # --- MODIFIED: This area is now dedicated to tab content ---
-        if active_panel_tab == "lobby":
-            # --- MODIFIED: Draw the new Leaderboard UI ---
-            title_y_offset = 70 # Y-position for the title
-            active_title_surface = panel_tab_font.render("Leaderboard", True, TEXT_COLOR)
-            window.blit(active_title_surface, (WIDTH + 20, title_y_offset))
+            # 2. Draw Content Based on Active Tab
+            # --- MODIFIED: This area is now dedicated to tab content ---
+            if active_panel_tab == "lobby":
+                # --- MODIFIED: Draw the new Leaderboard UI ---
+                title_y_offset = 70 # Y-position for the title
+                blit(active_title_surface, (WIDTH + 20, title_y_offset))
             
-            y_offset = title_y_offset + 50
-            sorted_players = sorted(players.items(), key=lambda p: p[1]["score"], reverse=True)
-            for i, (player_id, player) in enumerate(sorted_players):
-                # Avatar
-                sprite = LOBBY_SPRITE_CACHE.get(player_id) 
-                if sprite:
-                    small_sprite = pygame.transform.scale(sprite, (35, 45)) 
-                    window.blit(small_sprite, (WIDTH + 20, y_offset - 5)) # -5 to align
+                y_offset = title_y_offset + 50
+                for i, (player_id, player) in enumerate(sorted_players):
+                    # Avatar
+                    small_sprite = AVATAR_SCALED.get(player_id) # Pre-scaled 35x45 copy of the lobby sprite
+                    if small_sprite:
+                        blit(small_sprite, (WIDTH + 20, y_offset - 5)) # -5 to align
                 
-                # Name
-                player_text_surface = panel_leaderboard_font.render( # <-- USE NEW FONT
-                    player['name'], 
-                    True, 
-                    tuple(player['color'])
-                )
-                window.blit(player_text_surface, (WIDTH + 70, y_offset + 5)) # <-- Added 5px Y offset for centering
+                    # Name
+                    player_text_surface = cached_render(panel_leaderboard_font, player['name'], player['color']) # <-- USE NEW FONT
+                    blit(player_text_surface, (WIDTH + 70, y_offset + 5)) # <-- Added 5px Y offset for centering
                 
-                # --- Score Box ---
-                score_str = str(player['score'])
-                score_text_surface = score_box_font.render(score_str, True, (0,0,0)) # Black text
-                score_text_rect = score_text_surface.get_rect()
+                    # --- Score Box ---
+                    score_str = str(player['score'])
+                    score_text_surface = cached_render(score_box_font, score_str, (0,0,0)) # Black text
+                    score_text_rect = score_text_surface.get_rect()
                 
-                box_width = max(30, score_text_rect.width + 10)
-                box_height = 25
-                box_x = WIDTH + SIDE_PANEL_WIDTH - box_width - 15
-                box_y = y_offset
+                    box_width = max(30, score_text_rect.width + 10)
+                    box_height = 25
+                    box_x = WIDTH + SIDE_PANEL_WIDTH - box_width - 15
+                    box_y = y_offset
                 
-                pygame.draw.rect(window, (255, 255, 255), (box_x, box_y, box_width, box_height), border_radius=8)
-                score_text_rect.center = (box_x + box_width // 2, box_y + box_height // 2)
-                window.blit(score_text_surface, score_text_rect)
-                # --- End Score Box ---
+                    draw_rect(window, (255, 255, 255), (box_x, box_y, box_width, box_height), border_radius=8)
+                    score_text_rect.center = (box_x + box_width // 2, box_y + box_height // 2)
+                    blit(score_text_surface, score_text_rect)
+                    # --- End Score Box ---
                 
-                y_offset += 50
+                    y_offset += 50
         
-        elif active_panel_tab == "chat":
-            # --- Draw the NEW Chat UI ---
-            # This function now draws the history
-            draw_chat_ui(my_player_id, chat_input_rect.top - 10) # <-- USE GLOBAL RECT
+            elif active_panel_tab == "chat":
+                # --- Draw the NEW Chat UI ---
+                # This function now draws the history
+                draw_chat_ui(my_player_id, chat_input_rect.top - 10) # <-- USE GLOBAL RECT
             
-            # --- MODIFIED: Draw the input box here ---
-            input_color = (255, 255, 255) if is_chatting else (100, 100, 100)
-            pygame.draw.rect(window, input_color, chat_input_rect, 2, border_radius=20)
+                # --- MODIFIED: Draw the input box here ---
+                input_color = (255, 255, 255) if is_chatting else (100, 100, 100)
+                draw_rect(window, input_color, chat_input_rect, 2, border_radius=20)
             
-            pygame.draw.circle(window, input_color, chat_send_rect.center, 20, 2)
-            if chat_send_img:
-                window.blit(chat_send_img, chat_send_img.get_rect(center=chat_send_rect.center))
+                draw_circle(window, input_color, chat_send_rect.center, 20, 2)
+                if chat_send_img:
+                    blit(chat_send_img, chat_send_img.get_rect(center=chat_send_rect.center))
             
-            text_to_draw = current_chat_message
-            if is_chatting:
-                if int(time.time() * 2) % 2 == 0: text_to_draw += "|"
-            elif not current_chat_message:
-                text_to_draw = "Enter Here..."
-                input_color = (100, 100, 100) 
+                text_surface = get_chat_input_surface(input_color)
+                text_rect = text_surface.get_rect(midleft=(chat_input_rect.left + 15, chat_input_rect.centery))
             
-            text_surface = chat_input_font.render(text_to_draw, True, input_color)
-            text_rect = text_surface.get_rect(midleft=(chat_input_rect.left + 15, chat_input_rect.centery))
+                clip_area = pygame.Rect(chat_input_rect.left + 15, chat_input_rect.top, chat_input_rect.width - 20, chat_input_rect.height)
+                original_clip = window.get_clip()
+                window.set_clip(clip_area)
+                blit(text_surface, text_rect)
+                window.set_clip(original_clip)
             
-            clip_area = pygame.Rect(chat_input_rect.left + 15, chat_input_rect.top, chat_input_rect.width - 20, chat_input_rect.height)
-            original_clip = window.get_clip()
-            window.set_clip(clip_area)
-            window.blit(text_surface, text_rect)
-            window.set_clip(original_clip)
-            
-        # --- END MODIFIED ---
+            # --- END MODIFIED ---
         
-        # --- MODIFIED: Draw Timer and Leave Button (part of new UI) ---
-        # This footer section is now drawn ALWAYS, regardless of the tab.
+            # --- MODIFIED: Draw Timer and Leave Button (part of new UI) ---
+            # This footer section is now drawn ALWAYS, regardless of the tab.
         
-        # Draw the divider line above "Time Left"
-        divider_y = HEIGHT - 190 
-        pygame.draw.line(window, TAB_LINE_COLOR, (WIDTH, divider_y), (WIDTH + SIDE_PANEL_WIDTH, divider_y), 2)
-
-        if game_end_time > 0:
-            time_remaining = max(0, game_end_time - time.time())
-            minutes = int(time_remaining // 60); seconds = int(time_remaining % 60)
-            timer_text_str = f"{minutes:02d}:{seconds:02d}"
-            timer_color = (255, 0, 0) if time_remaining < 10 else TEXT_COLOR
+            # Draw the divider line above "Time Left"
+            divider_y = HEIGHT - 190 
+            pygame.draw.line(window, TAB_LINE_COLOR, (WIDTH, divider_y), (WIDTH + SIDE_PANEL_WIDTH, divider_y), 2)
+
+            if game_end_time > 0:
+                time_remaining = max(0, game_end_deadline - time_now())
             
-            timer_title_surface = panel_tab_font.render("Time Left", True, TEXT_COLOR)
-            # --- MODIFIED: Moved title up ---
-            title_rect = timer_title_surface.get_rect(center=(WIDTH + SIDE_PANEL_WIDTH // 2, divider_y + 30)) # Was + 35
-            window.blit(timer_title_surface, title_rect)
+                blit(timer_title_surface, timer_title_rect)
             
-            timer_text_surface = timer_number_font.render(timer_text_str, True, timer_color)
-            # --- MODIFIED: Moved timer up significantly ---
-            text_rect = timer_text_surface.get_rect(center=(WIDTH + SIDE_PANEL_WIDTH // 2, divider_y + 65)) # Was + 80
-            window.blit(timer_text_surface, text_rect)
+                # The displayed MM:SS (and its color) only change once a second; re-fetch the surface then
+                timer_second = int(time_remaining)
+                if timer_second != shown_timer_second:
+                    shown_timer_second = timer_second
+                    timer_color = (255, 0, 0) if timer_second < 10 else TEXT_COLOR
+                    timer_text_surface = cached_render(timer_number_font, f"{timer_second // 60:02d}:{timer_second % 60:02d}", timer_color)
+                    # --- MODIFIED: Moved timer up significantly ---
+                    timer_text_rect = timer_text_surface.get_rect(center=(WIDTH + SIDE_PANEL_WIDTH // 2, divider_y + 65)) # Was + 80
+                blit(timer_text_surface, timer_text_rect)
         
-        # Draw Leave Button (position is unchanged, but now has space above it)
-        if leave_button_rect.collidepoint(mouse_pos) and not is_chatting:
-            color = leave_color_click if mouse_pressed[0] else leave_color_hover
-        else:
-            color = leave_color_inactive
-        pygame.draw.rect(window, color, leave_button_rect, border_radius=15)
-        window.blit(leave_text, leave_text.get_rect(center=leave_button_rect.center))
+            # Draw Leave Button (position is unchanged, but now has space above it)
+            if leave_button_rect.collidepoint(mouse_pos) and not is_chatting:
+                color = leave_color_click if mouse_pressed[0] else leave_color_hover
+            else:
+                color = leave_color_inactive
+            draw_rect(window, color, leave_button_rect, border_radius=15)
+            blit(leave_text, leave_text.get_rect(center=leave_button_rect.center))
         
-        # --- Countdown Overlay (Unchanged) ---
-        if not game_has_started:
-            countdown_num = int(time_to_start) + 1
-            countdown_text_str = f"Starting in {countdown_num}..."
-            if countdown_num <= 0:
-                countdown_text_str = "GO!"
+            # --- Countdown Overlay (Unchanged) ---
+            if not game_has_started:
+                countdown_text_str = f"Starting in {countdown_num}..."
+                if countdown_num <= 0:
+                    countdown_text_str = "GO!"
                 
-            countdown_text_surface = title_font.render(countdown_text_str, True, TEXT_COLOR)
-            countdown_rect = countdown_text_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2))
-            
-            overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 128))
-            window.blit(overlay, (0, 0))
+                blit(COUNTDOWN_OVERLAY, (0, 0))
             
-            outline_surface = title_font.render(countdown_text_str, True, (0,0,0))
-            # Use a simpler outline
-            for dx in [-2, 2]:
-                for dy in [-2, 2]:
-                    window.blit(outline_surface, (countdown_rect.x + dx, countdown_rect.y + dy))
-            
-            window.blit(countdown_text_surface, countdown_rect)
+                # Use a simpler outline (baked in, 2px)
+                countdown_surface = get_label_text(countdown_text_str, title_font, TEXT_COLOR, offset=2)
+                blit(countdown_surface, countdown_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2)))
 
-        pygame.display.flip()
-        await asyncio.sleep(0.01)
+            pygame.display.flip()
+    finally:
+        recv_task.cancel()
     
     if walking_sound_channel:
         walking_sound_channel.stop()
@@ -1480,7 +2029,7 @@ def show_leaderboard_screen(final_players):
     title_text_surface = title_font.render("ROUND OVER", True, (255, 0, 0))
     title_rect = title_text_surface.get_rect(center=(WIDTH // 2, 100))
     
-    sorted_player_data = sorted(final_players.values(), key=lambda p: p["score"], reverse=True)
+    sorted_players = sorted(final_players.items(), key=lambda kv: kv[1]["score"], reverse=True)
     
     start_ticks = pygame.time.get_ticks()
     DURATION = 10000 
@@ -1498,37 +2047,23 @@ def show_leaderboard_screen(final_players):
         window.blit(title_text_surface, title_rect)
         
         time_left_sec = (DURATION - elapsed) // 1000 + 1
-        return_text_surface = font.render(f"Game exiting in {time_left_sec}...", True, TEXT_COLOR)
+        return_text_surface = cached_render(font, f"Game exiting in {time_left_sec}...", TEXT_COLOR)
         return_rect = return_text_surface.get_rect(center=(WIDTH + SIDE_PANEL_WIDTH // 2, HEIGHT - 50))
         window.blit(return_text_surface, return_rect)
 
         y_offset = 200
-        for i, player_data in enumerate(sorted_player_data):
-            player_id_str = None
-            for pid, pdata in final_players.items():
-                if pdata["name"] == player_data["name"]: 
-                    player_id_str = pid
-                    break
-            
-            # --- MODIFIED: Get idle frame (index 0) ---
-            sprite_list = GAME_SPRITE_CACHE_R.get(player_id_str) 
-            if sprite_list:
-                sprite = sprite_list[0] # Get idle frame
-                if sprite:
-                    big_sprite = pygame.transform.scale(sprite, (PLAYER_SIZE * 1.5, int(PLAYER_SIZE * 1.1 * 1.5)))
-                    sprite_rect = big_sprite.get_rect(center=(WIDTH // 2 - 150, y_offset))
-                    window.blit(big_sprite, sprite_rect)
+        for i, (player_id_str, player_data) in enumerate(sorted_players):
+            # Idle frame, pre-scaled when the game sprite cache was filled
+            big_sprite = ROUND_OVER_SPRITES.get(player_id_str)
+            if big_sprite:
+                sprite_rect = big_sprite.get_rect(center=(WIDTH // 2 - 150, y_offset))
+                window.blit(big_sprite, sprite_rect)
 
             line_text_str = f"#{i+1}: {player_data['name']} - {player_data['score']} points"
-            line_color = tuple(player_data['color'])
-            line_text_surface = font.render(line_text_str, True, line_color)
-            line_rect = line_text_surface.get_rect(midleft=(WIDTH // 2 - 100, y_offset))
-            outline_text_surface = font.render(line_text_str, True, (0,0,0))
-            # Use simpler outline
-            for dx in [-1, 1]:
-                 for dy in [-1, 1]:
-                    window.blit(outline_text_surface, (line_rect.x + dx, line_rect.y + dy))
-            window.blit(line_text_surface, line_rect)
+            line_color = player_data['color']
+            # Use simpler outline (baked in; the 1px padding is why x starts 1px further left)
+            line_surface = get_label_text(line_text_str, font, line_color)
+            window.blit(line_surface, line_surface.get_rect(midleft=(WIDTH // 2 - 100 - 1, y_offset)))
             y_offset += 100 
         
         # --- NEW: Draw final chat history ---
@@ -1546,13 +2081,20 @@ def show_leaderboard_screen(final_players):
         clock.tick(FRAME_RATE)
 
 # --- MODIFIED: Main function (clears all caches) ---
+async def close_pending_connection(connect_task):
+    """Cancels a connection handshake still in flight, or closes the connection it already opened."""
+    if not connect_task.done():
+        connect_task.cancel()
+    elif not connect_task.cancelled() and connect_task.exception() is None:
+        await connect_task.result().close()
+
 async def main():
     global LOBBY_VISUALS, LOBBY_SPRITE_CACHE, GAME_SPRITE_CACHE_L, GAME_SPRITE_CACHE_R
     # --- NEW: Clear chat history on start ---
     global chat_history, is_chatting, current_chat_message
     
-    player_name = input("Please enter your name: ")
-    lobby_password = input("Enter lobby password: ") 
+    # input() runs in a worker thread so the event loop stays free while the user types
+    player_name = await asyncio.to_thread(input, "Please enter your name: ")
 
     uri = "ws://localhost:8765" # Localhost for testing
     # To deploy online: host server.py on Railway (or Heroku), set the PORT and
@@ -1560,43 +2102,59 @@ async def main():
     # uri = "wss://<your-app>.up.railway.app"
     
     print(f"Connecting to {uri}...")
+    # Start the handshake now so it overlaps with the password prompt.
+    # Small JSON frames gain nothing from permessage-deflate; skip the zlib work on every send/recv
+    connect_task = asyncio.ensure_future(websockets.connect(uri, compression=None))
+    try:
+        lobby_password = await asyncio.to_thread(input, "Enter lobby password: ")
+    except BaseException: # EOF or Ctrl-C at the prompt: don't leave the handshake behind
+        await close_pending_connection(connect_task)
+        raise
     final_players = None
     my_player_id = 0 # Default
+    websocket = None
 
     try:
-        async with websockets.connect(uri) as websocket:
-            await websocket.send(json.dumps({"type": "join", "name": player_name, "password": lobby_password}))
-            response_str = await websocket.recv()
-            response = json.loads(response_str)
-
-            if response.get("type") == "join_success":
-                my_player_id = response.get("player_id") # Get the real player ID
-                print(f"Successfully joined lobby! You are Player {my_player_id}.")
-                KNOWN_PLAYER_COUNT = 1
-                
-                # --- NEW: Add welcome message to chat ---
-                chat_history.append({"type": "system", "msg": f"Welcome, {player_name}!"})
+        websocket = await connect_task
+        await websocket.send(json_dumps({"type": "join", "name": player_name, "password": lobby_password}))
+        response_str = await websocket.recv()
+        response = json_loads(response_str)
+
+        if response.get("type") == "join_success":
+            my_player_id = response.get("player_id") # Get the real player ID
+            print(f"Successfully joined lobby! You are Player {my_player_id}.")
+            KNOWN_PLAYER_COUNT = 1
+            
+            # --- NEW: Add welcome message to chat ---
+            chat_history.append({"type": "system", "msg": f"Welcome, {player_name}!"})
 
-                initial_game_data = await lobby_loop(websocket, my_player_id)
+            initial_game_data = await lobby_loop(websocket, my_player_id)
+            
+            if initial_game_data: 
+                print("Lobby finished, starting game...")
                 
-                if initial_game_data: 
-                    print("Lobby finished, starting game...")
-                    
-                    LOBBY_VISUALS.clear()
-                    LOBBY_SPRITE_CACHE.clear()
-                    GAME_SPRITE_CACHE_L.clear() 
-                    GAME_SPRITE_CACHE_R.clear()
-                    # --- NEW: Clear chat state variables for game ---
-                    is_chatting = False
-                    current_chat_message = ""
-                    chat_history.append({"type": "system", "msg": "Game started! GO!"})
-                    
-                    final_players = await game_loop(websocket, my_player_id, initial_game_data)
-                else:
-                    print("Left lobby, not starting game.")
+                LOBBY_VISUALS.clear()
+                pack_lobby_visuals()
+                LOBBY_SPRITE_CACHE.clear()
+                ROTATED_SPRITE_CACHE.clear()
+                PENDING_LOBBY_SPRITES.clear()
+                PENDING_LOBBY_COLORS.clear()
+                AVATAR_SCALED.clear()
+                AVATAR_SCALED_FLIPPED.clear()
+                GAME_SPRITE_CACHE_L.clear() 
+                GAME_SPRITE_CACHE_R.clear()
+                ROUND_OVER_SPRITES.clear()
+                # --- NEW: Clear chat state variables for game ---
+                is_chatting = False
+                clear_chat_input()
+                chat_history.append({"type": "system", "msg": "Game started! GO!"})
                 
+                final_players = await game_loop(websocket, my_player_id, initial_game_data)
             else:
-                print(f"Failed to join lobby: {response.get('reason', 'Unknown error')}")
+                print("Left lobby, not starting game.")
+            
+        else:
+            print(f"Failed to join lobby: {response.get('reason', 'Unknown error')}")
 
     except websockets.exceptions.ConnectionClosed as e:
         print(f"Connection closed (Game Over or Left): {e.code} {e.reason}")
@@ -1608,6 +2166,8 @@ async def main():
         traceback.print_exc()
     
     finally:
+        if websocket is not None:
+            await websocket.close()
         if final_players is not None:
             print("Game over, showing leaderboard...")
             chat_history.append({"type": "system", "msg": "Round over!"})
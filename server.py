@@ -4,6 +4,22 @@ import random
 import websockets
 import os
 import time # Make sure time is imported
+import functools
+
+try:
+    import uvloop # Optional: libuv-based event loop, faster socket I/O (Linux/macOS)
+except ImportError:
+    uvloop = None
+
+try:
+    import orjson # Optional C JSON codec; much faster on the big state updates
+    json_loads = orjson.loads
+    def json_dumps_bytes(obj):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS) # Player ids are int keys
+except ImportError:
+    json_loads = json.loads
+    def json_dumps_bytes(obj):
+        return json.dumps(obj).encode("utf-8")
 
 # Constants
 WIDTH, HEIGHT = 800, 600
@@ -17,47 +33,297 @@ resources = []
 next_player_id = 1
 next_resource_id = 1
 clients = {} 
+outboxes = {} # player_id -> asyncio.Queue of encoded frames, drained by that client's writer task
+OUTBOX_MAX = 32 # State frames are skipped for a client this far behind; chat and system messages always queue
 LOBBY_PASSWORD = ""
 game_state = "lobby"
 host_player_id = 0
 game_start_time = 0
 game_end_time = 0
 STATE_LOCK = asyncio.Lock() 
+state_dirty = False # Set by handlers that changed the game state; the broadcast tick sends it
+BROADCAST_INTERVAL = 1 / 30 # State updates go out at most 30 times a second
+
+# --- Spatial hash: players and coins bucketed into PLAYER_SIZE cells ---
+# The dicts in `players` and `resources` stay the source of truth (they are what gets broadcast);
+# the grids only index them. Boxes are PLAYER_SIZE wide, so anything overlapping a box centred
+# at (x, y) has its own centre in the 3x3 cells around (x, y): a check looks at those, not at everyone.
+GRID_CELL = PLAYER_SIZE
+NEIGHBOUR_OFFSETS = [(gx, gy) for gx in (-1, 0, 1) for gy in (-1, 0, 1)]
+player_grid = {} # (cx, cy) -> set of player ids in that cell
+player_cells = {} # player_id -> its cell
+player_join_order = {} # player_id -> rank, so overlaps still resolve to the earliest joiner
+
+def grid_cell(x, y):
+    return (int(x // GRID_CELL), int(y // GRID_CELL))
+
+def rebuild_player_grid():
+    """Re-derives the player grid after players join or leave. Call with STATE_LOCK held."""
+    player_grid.clear()
+    player_cells.clear()
+    player_join_order.clear()
+    for rank, (pid, player) in enumerate(players.items()):
+        cell = grid_cell(player["x"], player["y"])
+        player_grid.setdefault(cell, set()).add(pid)
+        player_cells[pid] = cell
+        player_join_order[pid] = rank
+
+def set_player_position(player_id, x, y):
+    player = players[player_id]
+    player["x"] = x; player["y"] = y
+    cell = grid_cell(x, y)
+    old_cell = player_cells[player_id]
+    if cell != old_cell:
+        bucket = player_grid[old_cell]
+        bucket.discard(player_id)
+        if not bucket:
+            del player_grid[old_cell]
+        player_grid.setdefault(cell, set()).add(player_id)
+        player_cells[player_id] = cell
+
+def find_overlap(x, y, skip_id, other_skip_id=None):
+    """Returns the first player (in join order) whose box overlaps one centred at (x, y), ignoring the skipped ids."""
+    cx, cy = grid_cell(x, y)
+    found = None
+    for gx, gy in NEIGHBOUR_OFFSETS:
+        bucket = player_grid.get((cx + gx, cy + gy))
+        if not bucket: continue
+        for other_id in bucket:
+            if other_id == skip_id or other_id == other_skip_id: continue
+            other_player = players[other_id]
+            if -PLAYER_SIZE < x - other_player["x"] < PLAYER_SIZE and -PLAYER_SIZE < y - other_player["y"] < PLAYER_SIZE:
+                if found is None or player_join_order[other_id] < player_join_order[found]:
+                    found = other_id
+    return found
+
+def move_player(player_id, dx, dy):
+    """Moves a player one axis at a time, pushing a player in the way if that one has room.
+    Returns whether anyone actually moved. Call with STATE_LOCK held."""
+    player = players[player_id]
+    # The mover's position is worked on in locals and written back once; find_overlap skips
+    # the mover, so nothing reads its stale dict entry in between
+    old_x, old_y = x, y = player["x"], player["y"]
+    pushed = False
+    potential_x = x + dx
+    collided_player_id_x = find_overlap(potential_x, y, player_id)
+    if collided_player_id_x is not None:
+        target_player = players[collided_player_id_x]
+        target_x, target_y = target_player["x"], target_player["y"]
+        target_potential_x = target_x + dx
+        if (PLAYER_SIZE // 2 <= target_potential_x <= WIDTH - PLAYER_SIZE // 2
+                and find_overlap(target_potential_x, target_y, player_id, collided_player_id_x) is None):
+            set_player_position(collided_player_id_x, target_potential_x, target_y)
+            pushed = dx != 0
+            x = potential_x
+    else:
+        x = potential_x
+    potential_y = y + dy
+    collided_player_id_y = find_overlap(x, potential_y, player_id)
+    if collided_player_id_y is not None:
+        target_player = players[collided_player_id_y]
+        target_x, target_y = target_player["x"], target_player["y"]
+        target_potential_y = target_y + dy
+        if (PLAYER_SIZE // 2 <= target_potential_y <= HEIGHT - PLAYER_SIZE // 2
+                and find_overlap(target_x, target_potential_y, player_id, collided_player_id_y) is None):
+            set_player_position(collided_player_id_y, target_x, target_potential_y)
+            pushed = pushed or dy != 0
+            y = potential_y
+    else:
+        y = potential_y
+    # Pushed players are only moved when they stay inside, so only the mover can need clamping
+    x = max(PLAYER_SIZE // 2, min(WIDTH - PLAYER_SIZE // 2, x))
+    y = max(PLAYER_SIZE // 2, min(HEIGHT - PLAYER_SIZE // 2, y))
+    if x == old_x and y == old_y:
+        return pushed # e.g. walking into a wall or a player that can't be pushed
+    set_player_position(player_id, x, y)
+    return True
+
+coin_grid = {} # (cx, cy) -> list of coin dicts in that cell
+coin_rows = {} # coin id -> index in `resources`, so a pickup can swap-remove it
+
+def rebuild_coin_grid():
+    """Re-derives the coin grid after `resources` is replaced or cleared. Call with STATE_LOCK held."""
+    coin_grid.clear()
+    coin_rows.clear()
+    for row, resource in enumerate(resources):
+        coin_grid.setdefault(grid_cell(resource["x"], resource["y"]), []).append(resource)
+        coin_rows[resource["id"]] = row
+
+def add_coin(resource):
+    """Appends a coin to `resources` and the grid. Call with STATE_LOCK held."""
+    coin_rows[resource["id"]] = len(resources)
+    resources.append(resource)
+    coin_grid.setdefault(grid_cell(resource["x"], resource["y"]), []).append(resource)
+
+def remove_coin_row(resource):
+    # Swap-remove: the last coin takes its slot; coin order doesn't matter to anyone
+    row = coin_rows.pop(resource["id"])
+    last = resources.pop()
+    if last is not resource:
+        resources[row] = last
+        coin_rows[last["id"]] = row
+
+def collect_coins(player):
+    """Removes every coin under `player` and adds them to its score; returns how many. Call with STATE_LOCK held."""
+    collected = 0
+    px, py = player["x"], player["y"]
+    cx, cy = grid_cell(px, py)
+    for gx, gy in NEIGHBOUR_OFFSETS:
+        cell = (cx + gx, cy + gy)
+        bucket = coin_grid.get(cell)
+        if not bucket: continue
+        picked = [resource for resource in bucket
+                  if abs(px - resource["x"]) < PLAYER_SIZE / 2 and abs(py - resource["y"]) < PLAYER_SIZE / 2]
+        if not picked: continue
+        player["score"] += len(picked)
+        collected += len(picked)
+        for resource in picked:
+            bucket.remove(resource)
+            remove_coin_row(resource)
+        if not bucket:
+            del coin_grid[cell]
+    return collected
+
+# Replies that never change, encoded once
+JOIN_FAIL_IN_PROGRESS = json_dumps_bytes({"type": "join_fail", "reason": "Game is already in progress."})
+JOIN_FAIL_WRONG_PASSWORD = json_dumps_bytes({"type": "join_fail", "reason": "Wrong password"})
 
 # --- NEW: Helper function for chat timestamp ---
 def get_chat_timestamp():
     """Returns a formatted string for the chat timestamp, e.g., '14:32'"""
-    return time.strftime("%H:%M", time.localtime())
+    return _format_minute(int(time.time() // 60))
+
+@functools.lru_cache(maxsize=1)
+def _format_minute(minute):
+    # The string only changes once a minute; every message in between reuses it
+    return time.strftime("%H:%M", time.localtime(minute * 60))
+
+# --- Per-client outgoing queues ---
+def queue_payload(outbox, payload, is_state=False):
+    """Queues an encoded frame for one client. A state frame (update or delta) is skipped instead
+    if the client has fallen OUTBOX_MAX frames behind; nothing already queued is ever dropped."""
+    if is_state and outbox.qsize() >= OUTBOX_MAX:
+        resync_outboxes.add(outbox) # It gets a full snapshot once it has caught up
+        return
+    outbox.put_nowait(payload)
+
+async def client_writer(websocket, outbox):
+    """Sends one client's queued frames in order, so a slow socket only ever delays itself."""
+    try:
+        while True:
+            await websocket.send(await outbox.get())
+    except websockets.exceptions.ConnectionClosed:
+        pass # Will be handled by the client's disconnect logic
 
 # --- NEW: Generic broadcast function ---
-async def broadcast_message(message_payload, skip_player_id=None):
-    """Broadcasts a JSON payload to all clients, with an option to skip one."""
-    if not clients:
+async def broadcast_message(message_payload, skip_player_id=None, is_state=False):
+    """Broadcasts a JSON payload (a dict, or bytes already encoded) to all clients, with an option to skip one.
+    Pass is_state=True for state frames, which clients that are far behind may skip (see queue_payload)."""
+    if not outboxes:
         return
     
-    message_json = json.dumps(message_payload)
+    # Encoded once; every client is sent the same bytes (a binary frame, so no per-client UTF-8 encode)
+    payload = message_payload if isinstance(message_payload, bytes) else json_dumps_bytes(message_payload)
     
-    for client_id, client_websocket in list(clients.items()):
-        if client_id == skip_player_id:
-            continue
-        try:
-            await client_websocket.send(message_json)
-        except websockets.exceptions.ConnectionClosed:
-            pass # Will be handled by the client's disconnect logic
+    # Hand the frame to each client's writer task; nothing here waits on a socket
+    for client_id, outbox in outboxes.items():
+        if client_id != skip_player_id:
+            queue_payload(outbox, payload, is_state)
 
 # --- MODIFIED: Broadcast function ---
+# One reusable "update" dict instead of a new one per broadcast tick
+update_payload = {
+    "type": "update",
+    "players": players,
+    "resources": resources,
+    "game_state": game_state,
+    "host_player_id": host_player_id,
+    "game_end_time": game_end_time
+}
+
+# --- Delta updates ---
+# Between full snapshots a tick only sends what changed: the players whose x/y/score moved
+# and the coins picked up or spawned. A full "update" still goes out whenever the roster or
+# one of the scalars changes, and to any client that skipped a state frame.
+sent_header = None # (game_state, host_player_id, game_end_time) of the last full update
+sent_players = {} # player_id -> (x, y, score) as of the last update or delta
+sent_coin_ids = set()
+resync_outboxes = set() # Outboxes that skipped a state frame (or asked for a resync) and still need a full snapshot
+KEYFRAME_INTERVAL = 1.0 # While playing, a full update still goes out this often, so a missed delta can't stick
+next_keyframe_time = 0
+
+def reset_sent_state():
+    """Forgets what was last sent, so the next broadcast is a full snapshot. Call when the server resets."""
+    global sent_header
+    sent_header = None
+    sent_players.clear()
+    sent_coin_ids.clear()
+
+def build_delta():
+    """Returns a "delta" message with everything that changed since the last send (None if nothing did), and records it as sent."""
+    moved = {}
+    for pid, player in players.items():
+        x, y, score = player["x"], player["y"], player["score"]
+        if sent_players[pid] != (x, y, score):
+            moved[pid] = {"x": x, "y": y, "score": score}
+            sent_players[pid] = (x, y, score)
+    coin_ids = coin_rows.keys()
+    removed = list(sent_coin_ids - coin_ids)
+    added = [resources[coin_rows[coin_id]] for coin_id in coin_ids - sent_coin_ids]
+    if not (moved or removed or added):
+        return None
+    sent_coin_ids.difference_update(removed)
+    sent_coin_ids.update(resource["id"] for resource in added)
+    return {"type": "delta", "moved": moved, "coins_removed": removed, "coins_added": added}
+
 async def broadcast_updates():
-    """Broadcasts the main game state to all clients."""
-    update_payload = {
-        "type": "update",
-        "players": players,
-        "resources": resources,
-        "game_state": game_state,
-        "host_player_id": host_player_id,
-        "game_end_time": game_end_time
-    }
-    # Use the new generic broadcast function
-    await broadcast_message(update_payload)
+    """Broadcasts the game state to all clients: a delta when only positions, scores or coins changed, else a full snapshot."""
+    global sent_header, next_keyframe_time
+    header = (game_state, host_player_id, game_end_time)
+    now = time.monotonic()
+    keyframe_due = game_state == "playing" and now >= next_keyframe_time
+    if not keyframe_due and header == sent_header and players.keys() == sent_players.keys():
+        delta = build_delta()
+        if delta is not None:
+            await broadcast_message(delta, is_state=True)
+        if resync_outboxes:
+            stale = [outbox for outbox in outboxes.values() if outbox in resync_outboxes] # Departed clients drop out here
+            resync_outboxes.clear()
+            ready = [outbox for outbox in stale if outbox.qsize() < OUTBOX_MAX]
+            resync_outboxes.update(outbox for outbox in stale if outbox.qsize() >= OUTBOX_MAX) # Still backed up; next tick
+            if ready:
+                full_payload = json_dumps_bytes(update_payload)
+                for outbox in ready:
+                    queue_payload(outbox, full_payload, is_state=True)
+    else:
+        # A game state change (start, leaderboard) always reaches everyone; routine snapshots may be skipped
+        is_state = sent_header is not None and sent_header[0] == game_state
+        # players/resources are always the same containers, so only the scalars need refreshing
+        update_payload["game_state"] = game_state
+        update_payload["host_player_id"] = host_player_id
+        update_payload["game_end_time"] = game_end_time
+        sent_header = header
+        next_keyframe_time = now + KEYFRAME_INTERVAL
+        sent_players.clear()
+        sent_players.update((pid, (p["x"], p["y"], p["score"])) for pid, p in players.items())
+        sent_coin_ids.clear()
+        sent_coin_ids.update(coin_rows.keys())
+        resync_outboxes.clear() # Everyone is sent this snapshot; any client that skips it is marked again
+        await broadcast_message(json_dumps_bytes(update_payload), is_state=is_state)
+
+def request_broadcast():
+    """Marks the game state as changed; broadcast_tick sends it on its next tick."""
+    global state_dirty
+    state_dirty = True
+
+async def broadcast_tick():
+    """Sends the latest state at a fixed rate, however many moves arrived in between."""
+    global state_dirty
+    while True:
+        await asyncio.sleep(BROADCAST_INTERVAL)
+        if state_dirty or resync_outboxes or (game_state == "playing" and time.monotonic() >= next_keyframe_time):
+            state_dirty = False
+            await broadcast_updates()
 
 # --- NEW: Game End Timer ---
 # This is the new logic you requested
@@ -77,7 +343,8 @@ async def end_game_timer(seconds_to_wait):
         if game_state == "playing":
             print("--- GAME TIMER ENDED. Moving to leaderboard. ---")
             game_state = "leaderboard"
-            resources.clear() 
+            resources.clear()
+            rebuild_coin_grid()
     finally:
         STATE_LOCK.release()
         
@@ -90,17 +357,16 @@ async def end_game_timer(seconds_to_wait):
     await STATE_LOCK.acquire()
     try:
         print("--- Leaderboard time over. Disconnecting all clients. ---")
-        for client_id, client_websocket in list(clients.items()):
-            try:
-                # Code 1000 = Normal Closure
-                await client_websocket.close(code=1000, reason="Game Over")
-            except websockets.exceptions.ConnectionClosed:
-                pass # Already disconnected
+        closing = list(clients.values()) # Closed after the lock is released
         
         # Reset server state for the next lobby
         players.clear()
+        rebuild_player_grid()
         clients.clear()
+        outboxes.clear()
         resources.clear()
+        rebuild_coin_grid()
+        reset_sent_state()
         game_state = "lobby"
         host_player_id = 0
         next_player_id = 1 # Reset player IDs
@@ -108,48 +374,65 @@ async def end_game_timer(seconds_to_wait):
     finally:
         STATE_LOCK.release()
 
+    # Close everyone at once (code 1000 = Normal Closure)
+    await asyncio.gather(
+        *[client_websocket.close(code=1000, reason="Game Over") for client_websocket in closing],
+        return_exceptions=True # Already disconnected is fine
+    )
+
 # --- Client Handler (Simplified) ---
 async def handle_client(websocket):
     global next_player_id, host_player_id, game_state, game_end_time, game_start_time
     player_id = 0
     player_name = ""
+    outbox = None
+    writer_task = None
 
     try:
         # 1. Handle Join
         join_message = await websocket.recv()
-        join_data = json.loads(join_message)
+        join_data = json_loads(join_message)
 
         if join_data.get("type") == "join" and join_data.get("password") == LOBBY_PASSWORD:
+            join_rejected = False
             await STATE_LOCK.acquire()
             try:
                 # --- Prevent joining a game in progress ---
                 if game_state != "lobby":
-                    await websocket.send(json.dumps({"type": "join_fail", "reason": "Game is already in progress."}))
-                    await websocket.close()
-                    return
-                
-                player_id = next_player_id
-                next_player_id += 1
-                player_name = join_data.get("name", f"Player{player_id}")
+                    join_rejected = True # Answered below, once the lock is released
+                else:
+                    player_id = next_player_id
+                    next_player_id += 1
+                    player_name = join_data.get("name", f"Player{player_id}")
                 
-                r, g, b = random.randint(100, 255), random.randint(100, 255), random.randint(100, 255)
-                player_color = join_data.get("color", (r,g,b))
+                    r, g, b = random.randint(100, 255), random.randint(100, 255), random.randint(100, 255)
+                    player_color = join_data.get("color", (r,g,b))
 
-                players[player_id] = {
-                    "x": random.randint(PLAYER_SIZE, WIDTH - PLAYER_SIZE),
-                    "y": random.randint(PLAYER_SIZE, HEIGHT - PLAYER_SIZE),
-                    "score": 0, "name": player_name, "color": player_color
-                }
-                clients[player_id] = websocket 
+                    players[player_id] = {
+                        "x": random.randint(PLAYER_SIZE, WIDTH - PLAYER_SIZE),
+                        "y": random.randint(PLAYER_SIZE, HEIGHT - PLAYER_SIZE),
+                        "score": 0, "name": player_name, "color": player_color
+                    }
+                    clients[player_id] = websocket 
+                    rebuild_player_grid()
+                    # join_success goes first in the queue so no broadcast can overtake it
+                    outbox = asyncio.Queue()
+                    queue_payload(outbox, json_dumps_bytes({"type": "join_success", "player_id": player_id}))
+                    outboxes[player_id] = outbox
+                    writer_task = asyncio.create_task(client_writer(websocket, outbox))
 
-                if len(players) == 1:
-                    host_player_id = player_id
-                print(f"Player {player_id} ({player_name}) has joined.")
+                    if len(players) == 1:
+                        host_player_id = player_id
+                    print(f"Player {player_id} ({player_name}) has joined.")
             finally:
                 STATE_LOCK.release()
             
-            await websocket.send(json.dumps({"type": "join_success", "player_id": player_id}))
-            await broadcast_updates()
+            if join_rejected:
+                await websocket.send(JOIN_FAIL_IN_PROGRESS)
+                await websocket.close()
+                return
+            
+            request_broadcast()
             
             # --- NEW: Broadcast join message to chat ---
             join_msg_payload = {
@@ -161,114 +444,70 @@ async def handle_client(websocket):
             # --- END NEW ---
             
         else:
-            await websocket.send(json.dumps({"type": "join_fail", "reason": "Wrong password"}))
+            await websocket.send(JOIN_FAIL_WRONG_PASSWORD)
             await websocket.close()
             return
 
         # 2. Handle Message Loop
         async for message in websocket:
-            data = json.loads(message)
+            data = json_loads(message)
             broadcast_needed = False
+            chat_payload = None # Built below, sent after the state changes
 
-            await STATE_LOCK.acquire()
-            try:
-                if data["type"] == "move":
-                    if game_state == "playing" and player_id in players:
-                        # ... (All your move/collision logic) ...
-                        player = players[player_id]
-                        old_x, old_y = player["x"], player["y"]
-                        potential_x = old_x + data["dx"]
-                        collided_player_id_x = None
-                        for other_id, other_player in players.items():
-                            if other_id == player_id: continue
-                            if abs(potential_x - other_player["x"]) < PLAYER_SIZE and abs(old_y - other_player["y"]) < PLAYER_SIZE:
-                                collided_player_id_x = other_id
-                                break
-                        if collided_player_id_x is not None:
-                            target_player = players[collided_player_id_x]
-                            target_potential_x = target_player["x"] + data["dx"]
-                            is_target_x_blocked = False
-                            if not (PLAYER_SIZE // 2 <= target_potential_x <= WIDTH - PLAYER_SIZE // 2): is_target_x_blocked = True
-                            if not is_target_x_blocked:
-                                for p3_id, p3_player in players.items():
-                                    if p3_id == player_id or p3_id == collided_player_id_x: continue
-                                    if abs(target_potential_x - p3_player["x"]) < PLAYER_SIZE and abs(target_player["y"] - p3_player["y"]) < PLAYER_SIZE:
-                                        is_target_x_blocked = True
-                                        break
-                            if not is_target_x_blocked:
-                                target_player["x"] = target_potential_x
-                                player["x"] = potential_x
-                        else:
-                            player["x"] = potential_x
-                        potential_y = old_y + data["dy"]
-                        collided_player_id_y = None
-                        for other_id, other_player in players.items():
-                            if other_id == player_id: continue
-                            if abs(player["x"] - other_player["x"]) < PLAYER_SIZE and abs(potential_y - other_player["y"]) < PLAYER_SIZE:
-                                collided_player_id_y = other_id
-                                break
-                        if collided_player_id_y is not None:
-                            target_player = players[collided_player_id_y]
-                            target_potential_y = target_player["y"] + data["dy"]
-                            is_target_y_blocked = False
-                            if not (PLAYER_SIZE // 2 <= target_potential_y <= HEIGHT - PLAYER_SIZE // 2): is_target_y_blocked = True
-                            if not is_target_y_blocked:
-                                for p3_id, p3_player in players.items():
-                                    if p3_id == player_id or p3_id == collided_player_id_y: continue
-                                    if abs(target_player["x"] - p3_player["x"]) < PLAYER_SIZE and abs(target_potential_y - p3_player["y"]) < PLAYER_SIZE:
-                                        is_target_y_blocked = True
-                                        break
-                            if not is_target_y_blocked:
-                                target_player["y"] = target_potential_y
-                                player["y"] = potential_y
-                        else:
-                            player["y"] = potential_y
-                        for p in players.values():
-                            p["x"] = max(PLAYER_SIZE // 2, min(WIDTH - PLAYER_SIZE // 2, p["x"]))
-                            p["y"] = max(PLAYER_SIZE // 2, min(HEIGHT - PLAYER_SIZE // 2, p["y"]))
-                        for resource in resources[:]:
-                            if abs(player["x"] - resource["x"]) < PLAYER_SIZE / 2 and abs(player["y"] - resource["y"]) < PLAYER_SIZE / 2:
-                                resources.remove(resource)
-                                player["score"] += 1
-                        broadcast_needed = True
-                
-                # --- NEW: Handle Chat Message ---
-                elif data["type"] == "chat":
-                    if player_id in players:
-                        sender_data = players[player_id]
-                        chat_payload = {
-                            "type": "chat_broadcast",
-                            "sender_id": player_id,
-                            "sender_name": sender_data.get("name", "Player"),
-                            "sender_color": sender_data.get("color", (255, 255, 255)),
-                            "message": data.get("message", ""),
-                            "timestamp": get_chat_timestamp()
-                        }
-                        # Send to everyone *except* the sender
-                        await broadcast_message(chat_payload, skip_player_id=player_id)
-                # --- END NEW ---
-                        
-                elif data["type"] == "start_game":
-                    if player_id == host_player_id and game_state == "lobby":
-                        duration_minutes = data.get("duration", 2)
-                        duration_seconds = duration_minutes * 60
-                        print(f"--- Game Started by Host (Player {player_id}) for {duration_minutes} minutes ---")
-                        game_state = "playing"
-                        game_start_time = time.time()
-                        game_end_time = game_start_time + duration_seconds
-                        asyncio.create_task(end_game_timer(duration_seconds))
+            # No await happens between here and the sends below, and no other coroutine awaits while
+            # holding STATE_LOCK, so this block already runs atomically on the event loop; no lock needed
+            if data["type"] == "move":
+                if game_state == "playing" and player_id in players:
+                    # A move that changed nothing (blocked, or no input) doesn't need a new state sent
+                    moved = move_player(player_id, data["dx"], data["dy"])
+                    if collect_coins(players[player_id]) or moved:
                         broadcast_needed = True
-                        
-            finally:
-                STATE_LOCK.release()
             
+            # --- NEW: Handle Chat Message ---
+            elif data["type"] == "chat":
+                if player_id in players:
+                    sender_data = players[player_id]
+                    chat_payload = {
+                        "type": "chat_broadcast",
+                        "sender_id": player_id,
+                        "sender_name": sender_data.get("name", "Player"),
+                        "sender_color": sender_data.get("color", (255, 255, 255)),
+                        "message": data.get("message", ""),
+                        "timestamp": get_chat_timestamp()
+                    }
+            # --- END NEW ---
+                    
+            elif data["type"] == "resync":
+                # The client dropped messages it couldn't keep up with; it gets a full update next tick
+                if outbox is not None:
+                    resync_outboxes.add(outbox)
+
+            elif data["type"] == "start_game":
+                if player_id == host_player_id and game_state == "lobby":
+                    duration_minutes = data.get("duration", 2)
+                    duration_seconds = duration_minutes * 60
+                    print(f"--- Game Started by Host (Player {player_id}) for {duration_minutes} minutes ---")
+                    game_state = "playing"
+                    game_start_time = time.time()
+                    game_end_time = game_start_time + duration_seconds
+                    asyncio.create_task(end_game_timer(duration_seconds))
+                    broadcast_needed = True
+                    
+            
+            if chat_payload:
+                # Send to everyone *except* the sender
+                await broadcast_message(chat_payload, skip_player_id=player_id)
             if broadcast_needed:
-                await broadcast_updates()
+                request_broadcast()
 
     except websockets.exceptions.ConnectionClosed:
         print(f"Connection closed for Player {player_id}.")
     finally:
         # 3. Handle Disconnect
+        if writer_task:
+            writer_task.cancel()
+        if outbox is not None and outboxes.get(player_id) is outbox: # The id may already belong to a new player after a reset
+            del outboxes[player_id]
         broadcast_updates_needed = False
         disconnect_msg_payload = None
         
@@ -286,6 +525,7 @@ async def handle_client(websocket):
                 # --- END NEW ---
                 
                 del players[player_id]
+                rebuild_player_grid()
                 if player_id in clients:
                     del clients[player_id] 
                 
@@ -308,6 +548,8 @@ async def handle_client(websocket):
                     host_player_id = 0
                     next_player_id = 1
                     resources.clear()
+                    rebuild_coin_grid()
+                    reset_sent_state()
                     broadcast_updates_needed = False # No one to update
 
         finally:
@@ -317,7 +559,7 @@ async def handle_client(websocket):
         if disconnect_msg_payload:
              await broadcast_message(disconnect_msg_payload) # Send chat message
         if broadcast_updates_needed:
-             await broadcast_updates() # Send game state update
+             request_broadcast() # Send game state update
 
 # --- Resource Spawner (Unchanged) ---
 async def spawn_resources():
@@ -329,7 +571,7 @@ async def spawn_resources():
             await STATE_LOCK.acquire()
             try:
                 if game_state == "playing":
-                    resources.append({
+                    add_coin({
                         "id": next_resource_id,
                         "x": random.randint(RESOURCE_SIZE, WIDTH - RESOURCE_SIZE),
                         "y": random.randint(RESOURCE_SIZE, HEIGHT - RESOURCE_SIZE)
@@ -339,7 +581,7 @@ async def spawn_resources():
             finally:
                 STATE_LOCK.release()
         if broadcast_needed:
-            await broadcast_updates()
+            request_broadcast()
 
 # --- Main Server Function (Unchanged) ---
 async def server_main():
@@ -348,15 +590,21 @@ async def server_main():
     print(f"Lobby password is set.")
     port = int(os.environ.get("PORT", 8765))
     
-    async with websockets.serve(handle_client, "0.0.0.0", port, ping_interval=20, ping_timeout=20):
+    # No permessage-deflate: it would compress the same broadcast separately for every connection,
+    # and the frames here are small JSON anyway (the client connects with compression=None too)
+    async with websockets.serve(handle_client, "0.0.0.0", port, ping_interval=20, ping_timeout=20, compression=None):
         print(f"Server started at ws://0.0.0.0:{port}")
         await asyncio.Future()
 
 async def main():
     await asyncio.gather(
         spawn_resources(),
+        broadcast_tick(),
         server_main()
     )
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())